@@ -228,7 +228,7 @@ class CFG:
                                C[0] if C[0].isupper() else
                                f"{C[0]}̄"))
 
-                    P[A].add(Rule(f"{B1}{C1}"))
+                    P.setdefault(A).add(Rule(f"{B1}{C1}"))
 
                     A = Rule(f"{C1[0]}")
 
@@ -242,12 +242,12 @@ class CFG:
                                    C[0] if C[0].isupper() else
                                    f"{C[0]}̄"))
 
-                        P[A].add(Rule(f"{B1}{C1}"))
+                        P.setdefault(A).add(Rule(f"{B1}{C1}"))
 
                         A = Rule(f"{C1[0]}")
 
                 else:
-                    P[A].add(Rule(rule))
+                    P.setdefault(A).add(Rule(rule))
 
             i += 1
 
@@ -334,10 +334,10 @@ class CFG:
 
         for A in L.N:
             for rule in L.P[A]:
-                δ["q", "ε", A].add(("q", rule))
+                δ.setdefault(("q", "ε", A)).add(("q", rule))
 
         for a in L.Σ:
-            δ["q", a, a].add(("q", "ε"))
+            δ.setdefault(("q", a, a)).add(("q", "ε"))
 
         return M
 
@@ -352,12 +352,12 @@ class CFG:
 
         for A in L.N:
             for rule in L.P[A]:
-                ô["q", "ε", rule].add(("q", A))
+                ô.setdefault(("q", "ε", rule)).add(("q", A))
 
         for a in L.Σ:
-            ô["q", a, "ε"].add(("q", a))
+            ô.setdefault(("q", a, "ε")).add(("q", a))
 
-        ô["q", "ε", "⊥S"].add(("r", "ε"))
+        ô.setdefault(("q", "ε", "⊥S")).add(("r", "ε"))
 
         return M
 
@@ -392,9 +392,14 @@ class P(dict):
             super().__setitem__(key, value)
 
     def __getitem__(self, key):
-        if key not in self:
-            super().__setitem__(key, Set())
-        return super().__getitem__(key)
+        """
+        the rules of a missing nonterminal are an empty Set which
+        is not stored, add to them with P.setdefault(A).add(rule)
+        """
+        return self.get(key, Set())
+
+    def setdefault(self, key, default=None):
+        return super().setdefault(key, Set() if default is None else default)
 
     def copy(self):
         return P(super().copy())
@@ -0,0 +1,1545 @@
+from array import array
+from bisect import bisect_right
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from functools import cached_property
+import mmap
+import os
+
+from utils import bits
+
+
+@dataclass(frozen=True)
+class CompiledDFA:
+    """
+    Compiled deterministic finite automata
+
+    states are numbered densely from 0, symbols which no state
+    tells apart share a class (as the byte classes of RE2) and the
+    transition function is a flat table over the classes
+
+        classes[i] = class of the symbol symbols[i]
+        table[q * width + c] = target state or -1 (no path)
+
+    symbol_index maps a symbol straight to its class,
+    accepting[q] is 1 for q ∈ F, 0 otherwise
+
+    bytes-like input (bytes, bytearray, memoryview) has one meaning
+    everywhere, in columns, finditer, Stream, test_parallel as well
+    as in ByteDFA: the byte b is the latin-1 character chr(b), so a
+    DFA over Σ = {"A", "\n"} matches b"A\n" and one over the numbers
+    "0".."255" matches no bytes at all
+
+    """
+
+    states: tuple
+    symbols: tuple
+    table: array
+    accepting: bytes
+    start: int
+    classes: tuple = None
+
+    width: int = field(init=False, repr=False, compare=False)
+    state_index: dict = field(init=False, repr=False, compare=False)
+    symbol_index: dict = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        if self.classes is None:
+            object.__setattr__(self, "classes", tuple(range(len(self.symbols))))
+        object.__setattr__(self, "width", max(self.classes, default=-1) + 1)
+        object.__setattr__(self, "state_index",
+                           {q: i for i, q in enumerate(self.states)})
+        object.__setattr__(self, "symbol_index",
+                           dict(zip(self.symbols, self.classes)))
+
+    @classmethod
+    def from_table(cls, states, symbols, table, accepting, start, classes=None):
+        """
+        build it from a table over classes (one per symbol by default)
+        merging the classes whose columns are equal in every state
+        """
+
+        classes = tuple(range(len(symbols))) if classes is None else classes
+        merge, table = _merge_columns(len(states), max(classes, default=-1) + 1, table)
+        return cls(states, symbols, table, accepting, start,
+                   tuple(merge[c] for c in classes))
+
+    @classmethod
+    def from_dfa(cls, dfa):
+        """
+        number the states of Q and the symbols of Σ in their order
+        and fill the table from δ
+        """
+
+        states, symbols, start, edges = edge_list(dfa)
+
+        m = len(symbols)
+        table = array('i', [-1]) * (len(states) * m)
+        for q, a, target in edges:
+            table[q * m + a] = target
+
+        accepting = bytearray(len(states))
+        for qf in dfa.F:
+            # a final state outside of Q and δ can never be reached
+            if qf in states:
+                accepting[states[qf]] = 1
+
+        return cls.from_table(tuple(states), tuple(symbols), table,
+                              bytes(accepting), start)
+
+    def run(self, word):
+        """
+        return the state reached after reading the word
+        or -1 if the automata got stuck
+        """
+
+        table, symbols, m = self.table, self.symbol_index, self.width
+        q = self.start
+        for a in word:
+            i = symbols.get(a)
+            if i is None:
+                i = symbols.get(str(a))
+                if i is None:
+                    return -1
+            q = table[q * m + i]
+            if q < 0:
+                return -1
+        return q
+
+    def test(self, word):
+        q = self.run(word)
+        return q >= 0 and self.accepting[q] == 1
+
+    def match(self, word):
+        """
+        return the length of the longest prefix of the word
+        which is accepted or -1 if there is none
+        """
+
+        table, symbols, m = self.table, self.symbol_index, self.width
+        accepting = self.accepting
+        q = self.start
+        longest = 0 if accepting[q] else -1
+        for n, a in enumerate(word, 1):
+            i = symbols.get(a)
+            if i is None:
+                i = symbols.get(str(a))
+                if i is None:
+                    break
+            q = table[q * m + i]
+            if q < 0:
+                break
+            if accepting[q]:
+                longest = n
+        return longest
+
+    def inverse(self):
+        """
+        index the transitions by target, the sources of δ(q, a) = t are
+
+            sources[offsets[a * n + t]:offsets[a * n + t + 1]]
+
+        where n is the number of states
+        """
+
+        n, m, table = len(self.states), self.width, self.table
+
+        offsets = array('i', [0]) * (n * m + 1)
+        for q in range(n):
+            for a in range(m):
+                t = table[q * m + a]
+                if t >= 0:
+                    offsets[a * n + t + 1] += 1
+        for i in range(n * m):
+            offsets[i + 1] += offsets[i]
+
+        sources = array('i', [0]) * offsets[-1]
+        fill = array('i', offsets)
+        for q in range(n):
+            for a in range(m):
+                t = table[q * m + a]
+                if t >= 0:
+                    sources[fill[a * n + t]] = q
+                    fill[a * n + t] += 1
+
+        return offsets, sources
+
+    def incoming(self):
+        """
+        index the transitions by target alone, δ(q, a) = t for
+
+            (q, a) in zip(sources[i], symbols[i])
+            for i in range(offsets[t], offsets[t + 1])
+
+        so that all of the transitions into a state are visited
+        without going through the symbols it has none under
+        """
+
+        n, m, table = len(self.states), self.width, self.table
+        edges = ((q, a, table[q * m + a]) for q in range(n) for a in range(m)
+                 if table[q * m + a] >= 0)
+        return incoming_index(n, edges)
+
+    def partition(self, labels=None):
+        """
+        Hopcroft's partition refinement
+
+        start from the states grouped by labels (accepting or not
+        by default) and split blocks by the preimages of splitter
+        blocks until the partition is stable, return the block id
+        of each state
+
+        a split always keeps the larger half under the old id and
+        queues the smaller one, so every state is in a splitter
+        at most log n times
+
+        δ may be partial, a splitter only visits the transitions into
+        its states, so the work follows the number of transitions and
+        not the number of states times the number of symbols
+
+        blocks are numbered in the order of their first state
+        """
+
+        labels = self.accepting if labels is None else labels
+        return refine(len(self.states), self.incoming(), labels)
+
+    def quotient(self, block):
+        """
+        merge the states of every block of a partition
+        into a single state named by the block id
+        """
+
+        k, m = max(block, default=-1) + 1, self.width
+        table = array('i', [-1]) * (k * m)
+        accepting = bytearray(k)
+        for q, b in enumerate(block):
+            accepting[b] = self.accepting[q]
+            for a in range(m):
+                t = self.table[q * m + a]
+                if t >= 0:
+                    table[b * m + a] = block[t]
+
+        return CompiledDFA.from_table(tuple(map(str, range(k))), self.symbols,
+                                      table, bytes(accepting), block[self.start],
+                                      self.classes)
+
+    def equivalent(self, other, witness=False):
+        """
+        Hopcroft–Karp, the pairs of states reachable from the two
+        starts are merged by a union-find and walked breadth first,
+        a pair already in one class is not followed again, so it is
+        near-linear and stops at the first pair with one side accepting
+
+        a missing transition goes to the dead state of its side,
+        return True or False, with witness=True (result, word) where
+        word is a shortest tuple of symbols accepted by just one of
+        the automata or None if they are equivalent
+        """
+
+        A, B = self, other
+        nA, mA, mB = len(A.states), A.width, B.width
+
+        # the states of A, its dead state, the states of B, its dead state
+        parent = list(range(nA + len(B.states) + 2))
+
+        def find(x):
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        def union(p, q):
+            x, y = find(p if p >= 0 else nA), find(nA + 1 + (q if q >= 0 else len(B.states)))
+            if x == y:
+                return False
+            parent[x] = y
+            return True
+
+        # symbols of the same pair of classes always lead to the same pair
+        columns = {}
+        for a in A.symbols + B.symbols:
+            columns.setdefault((A.symbol_index.get(a), B.symbol_index.get(a)), a)
+
+        start = (A.start, B.start)
+        union(*start)
+        came = {start: None}
+        work = deque([start])
+
+        while work:
+            p, q = work.popleft()
+            if (p >= 0 and A.accepting[p] == 1) != (q >= 0 and B.accepting[q] == 1):
+                if not witness:
+                    return False
+                word, pair = [], (p, q)
+                while came[pair] is not None:
+                    pair, a = came[pair]
+                    word.append(a)
+                return False, tuple(reversed(word))
+
+            for (ca, cb), a in columns.items():
+                p2 = A.table[p * mA + ca] if p >= 0 and ca is not None else -1
+                q2 = B.table[q * mB + cb] if q >= 0 and cb is not None else -1
+                if union(p2, q2):
+                    came[p2, q2] = ((p, q), a)
+                    work.append((p2, q2))
+
+        return (True, None) if witness else True
+
+    def toDFA(self, Σ=None):
+        """
+        convert back to DFA, the result keeps self as its compiled
+        form unless some of the state names are equal
+
+        Σ is an alphabet of the same symbols for the result (Set.share)
+        """
+        import DFA
+        from utils import Set
+
+        m = self.width
+        transitions = {}
+        for q, name in enumerate(self.states):
+            for symbol, a in zip(self.symbols, self.classes):
+                t = self.table[q * m + a]
+                if t >= 0:
+                    transitions[name, symbol] = Set(self.states[t])
+
+        F = Set([q for q, final in zip(self.states, self.accepting) if final])
+        M = DFA(Set(list(self.states)), Set(list(self.symbols)) if Σ is None else Σ,
+                DFA.δ(transitions), self.states[self.start], F)
+        if len(M.Q) == len(self.states):
+            M.cached("compiled", lambda: self)
+        return M
+
+    @cached_property
+    def byte_index(self):
+        """
+        symbol number of every byte (chr(b), see above),
+        -1 for bytes outside of the alphabet
+        """
+        return array('i', (self.symbol_index.get(chr(b), -1) for b in range(256)))
+
+    def stream(self):
+        return Stream(self)
+
+    def pack(self):
+        return PackedDFA.from_compiled(self)
+
+    def columns(self, text):
+        """
+        symbol numbers of the text, -1 for symbols outside of Σ,
+        bytes-like text is read through byte_index
+        """
+
+        if isinstance(text, (bytes, bytearray, memoryview)):
+            with memoryview(text) as view, view.cast('B') as data:
+                return [self.byte_index[b] for b in data]
+        symbols = self.symbol_index
+        return [symbols.get(str(a), -1) for a in text]
+
+    @cached_property
+    def live(self):
+        """
+        1 for the states from which some accepting state can still
+        be reached, 0 for the dead ones (such as ⊗)
+        """
+
+        return live_states(self.incoming(), self.accepting)
+
+    def starts(self, columns, max_states=10000):
+        """
+        scan the text backwards with the reverse automata of Σ*·L^R,
+        return a bytearray with 1 at every position where a match
+        can start
+
+        its states are bitmasks of the states that still reach F on
+        some prefix of the rest of the text, they are determinized
+        lazily and the cache is flushed after max_states entries
+        """
+
+        n = len(self.states)
+        offsets, sources = self.inverse()
+
+        final = 0
+        for q in range(n):
+            if self.accepting[q]:
+                final |= 1 << q
+        start = 1 << self.start
+
+        cache = {}
+        result = bytearray(len(columns) + 1)
+        S = final
+        result[-1] = (S & start) != 0
+        for i in range(len(columns) - 1, -1, -1):
+            a = columns[i]
+            if a < 0:
+                S = final
+            else:
+                T = cache.get((S, a))
+                if T is None:
+                    if len(cache) >= max_states:
+                        cache.clear()
+                    T = final
+                    for t in bits(S):
+                        for j in range(offsets[a * n + t], offsets[a * n + t + 1]):
+                            T |= 1 << sources[j]
+                    cache[S, a] = T
+                S = T
+            result[i] = (S & start) != 0
+        return result
+
+    def finditer(self, text, longest=True):
+        """
+        yield the (start, end) spans of the text matched by the
+        language, leftmost-longest or with longest=False leftmost-first
+        (the first accepting end is taken)
+
+        only the positions found by the reverse scan are tried and
+        a forward run stops as soon as it reaches a dead state,
+        an empty match moves the search one symbol further
+
+        the reverse scan is linear in the text, the forward runs are
+        not: a run looking for the longest match may read up to the
+        end of the text, so a|a*b over aaa...a costs O(n²)
+        """
+
+        columns = self.columns(text)
+        candidates = self.starts(columns)
+        table, m = self.table, self.width
+        accepting, live = self.accepting, self.live
+
+        i, n = 0, len(columns)
+        while i <= n:
+            if not candidates[i]:
+                i += 1
+                continue
+
+            q = self.start
+            end = i if accepting[q] else -1
+            if end < 0 or longest:
+                for j in range(i, n):
+                    a = columns[j]
+                    if a < 0:
+                        break
+                    q = table[q * m + a]
+                    if q < 0 or not live[q]:
+                        break
+                    if accepting[q]:
+                        end = j + 1
+                        if not longest:
+                            break
+
+            if end < 0:
+                i += 1
+                continue
+            yield i, end
+            i = end if end > i else i + 1
+
+    def find_all(self, text, longest=True):
+        return list(self.finditer(text, longest))
+
+    def test_parallel(self, data, workers=None, chunk_size=None):
+        """
+        test a large str or bytes-like input on all cores
+
+        the input is split into chunks, each worker computes the
+        mapping state → state its chunk induces and the mappings
+        are composed in order, so the result is the one of a
+        sequential run
+        """
+
+        workers = workers or os.cpu_count()
+        chunk_size = chunk_size or len(data) // (4 * workers) + 1
+        chunks = (data[i:i + chunk_size] for i in range(0, len(data), chunk_size))
+        return self._compose(chunks, workers)
+
+    def test_file_parallel(self, path, workers=None, chunk_size=None):
+        """
+        same as test_parallel, every worker maps its own slice of
+        the file through mmap instead of receiving a copy
+        """
+
+        workers = workers or os.cpu_count()
+        size = os.path.getsize(path)
+        chunk_size = chunk_size or size // (4 * workers) + 1
+        chunks = ((path, i, min(i + chunk_size, size)) for i in range(0, size, chunk_size))
+        return self._compose(chunks, workers)
+
+    def _compose(self, chunks, workers):
+        from concurrent.futures import ProcessPoolExecutor
+
+        q = self.start
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                 initargs=(self,)) as pool:
+            for mapping in pool.map(_chunk_mapping, chunks):
+                if q >= 0:
+                    q = mapping[q]
+        return q >= 0 and self.accepting[q] == 1
+
+    def mapping(self, chunk):
+        """
+        return the mapping state → state (-1 when stuck) induced by the
+        chunk, all of the states are run at once and merge as they meet
+        """
+
+        n, m, table = len(self.states), self.width, self.table
+        if isinstance(chunk, str):
+            symbols = self.symbol_index
+            columns = (symbols.get(a, -1) for a in chunk)
+        else:
+            columns = map(self.byte_index.__getitem__, memoryview(chunk).cast('B'))
+
+        current = {q: [q] for q in range(n)}
+        for i in columns:
+            if i < 0:
+                current = {}
+                break
+            if len(current) == 1:
+                # all of the states met, finish with a single run
+                (q, origins), = current.items()
+                q = table[q * m + i]
+                for i in columns:
+                    if q < 0 or i < 0:
+                        break
+                    q = table[q * m + i]
+                current = {q: origins} if q >= 0 and i >= 0 else {}
+                break
+            following = {}
+            for q, origins in current.items():
+                t = table[q * m + i]
+                if t < 0:
+                    continue
+                if t in following:
+                    following[t].extend(origins)
+                else:
+                    following[t] = origins
+            current = following
+            if not current:
+                break
+
+        result = array('i', [-1]) * n
+        for q, origins in current.items():
+            for origin in origins:
+                result[origin] = q
+        return result
+
+    @cached_property
+    def dense(self):
+        """
+        NumPy (n + 1) × (m + 1) table where the extra row n is the dead
+        state and the extra column m stands for symbols outside of Σ,
+        with accepting[n] = False
+        """
+        import numpy as np
+
+        n, m = len(self.states), self.width
+        table = np.full((n + 1, m + 1), n, dtype=np.int32)
+        table[:n, :m] = np.asarray(self.table, dtype=np.int32).reshape(n, m)
+        table[table < 0] = n
+
+        accepting = np.zeros(n + 1, dtype=bool)
+        accepting[:n] = np.frombuffer(self.accepting, dtype=np.uint8) == 1
+        return table, accepting
+
+    def encode(self, words):
+        """
+        encode the words into one flat buffer of symbol numbers
+        and the offsets where each word starts
+        """
+        import numpy as np
+
+        m = self.width
+        lengths = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+        offsets = np.zeros(len(words) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+
+        if all(isinstance(word, str) for word in words):
+            points = np.frombuffer("".join(words).encode("utf-32-le"), dtype=np.uint32)
+            single = [(ord(a), i) for a, i in self.symbol_index.items() if len(a) == 1]
+            lookup = np.full(max([p for p, _ in single] + [int(points.max(initial=0))]) + 1,
+                             m, dtype=np.int32)
+            for point, i in single:
+                lookup[point] = i
+            flat = lookup[points]
+        else:
+            symbols = self.symbol_index
+            flat = np.fromiter((symbols.get(str(a), m) for word in words for a in word),
+                               dtype=np.int32, count=int(offsets[-1]))
+
+        return flat, offsets
+
+    def test_many(self, words):
+        """
+        test all of the words at once, every step advances the state
+        of each word still being read by one fancy indexing of the
+        dense table, return a boolean NumPy array
+        """
+        import numpy as np
+
+        words = list(words)
+        table, accepting = self.dense
+        flat, offsets = self.encode(words)
+        lengths = np.diff(offsets)
+
+        # sorted by length the words still being read are a suffix
+        order = np.argsort(lengths, kind="stable")
+        starts, lengths = offsets[:-1][order], lengths[order]
+        states = np.full(len(words), self.start, dtype=np.int32)
+
+        first = 0
+        for t in range(int(lengths[-1]) if len(words) else 0):
+            first += int(np.searchsorted(lengths[first:], t, side="right"))
+            states[first:] = table[states[first:], flat[starts[first:] + t]]
+
+        result = np.empty(len(words), dtype=bool)
+        result[order] = accepting[states]
+        return result
+
+    def to_python(self):
+        """
+        return a Python function word → bool specialized for the
+        automata, its source is kept as the attribute source
+
+        small automata dispatch on nested ifs, larger ones look the
+        symbol up in a dict per state (ROWS, given to the function
+        rather than written in its source), transitions into dead states
+        return False at once, symbols must be given as in Σ (no str())
+
+        functions are cached by the structure of the table, so equal
+        automata share one function whatever their state names
+        """
+
+        key = (self.symbols, self.classes, self.table.tobytes(),
+               self.accepting, self.start)
+        function = _python_cache.get(key)
+        if function is None:
+            source, scope = (self._python_ifs() if len(self.states) <= 16 else
+                             self._python_rows())
+            exec(compile(source, "<CompiledDFA.to_python>", "exec"), scope)
+            function = scope["match"]
+            function.source = source
+            _python_cache[key] = function
+        return function
+
+    def _python_targets(self, q):
+        m, live = self.width, self.live
+        for symbol, a in zip(self.symbols, self.classes):
+            t = self.table[q * m + a]
+            if t >= 0 and live[t]:
+                yield symbol, t
+
+    def _python_accepting(self):
+        final = [str(q) for q in range(len(self.states)) if self.accepting[q]]
+        return f"q in {{{', '.join(final)}}}" if final else "False"
+
+    def _python_ifs(self):
+        start = self.start if self.live[self.start] else -1
+        lines = ["def match(word):",
+                 f"    q = {start}",
+                 "    for a in word:"]
+        keyword = "if"
+        for q in range(len(self.states)):
+            targets = list(self._python_targets(q))
+            if not targets:
+                continue
+            lines.append(f"        {keyword} q == {q}:")
+            keyword = "elif"
+            for i, (symbol, t) in enumerate(targets):
+                lines.append(f"            {'if' if i == 0 else 'elif'} a == {symbol!r}:")
+                lines.append(f"                q = {t}")
+            lines.append("            else:")
+            lines.append("                return False")
+        if keyword == "elif":
+            lines += ["        else:", "            return False"]
+        else:
+            lines.append("        return False")
+        lines.append(f"    return {self._python_accepting()}")
+        return "\n".join(lines) + "\n", {}
+
+    def _python_rows(self):
+        rows = tuple(dict(self._python_targets(q)) for q in range(len(self.states)))
+        if not self.live[self.start]:
+            return "def match(word):\n    return False\n", {}
+        return "\n".join([
+            "def match(word, rows=ROWS):",
+            f"    q = {self.start}",
+            "    for a in word:",
+            "        q = rows[q].get(a)",
+            "        if q is None:",
+            "            return False",
+            f"    return {self._python_accepting()}",
+        ]) + "\n", {"ROWS": rows}
+
+    def __len__(self):
+        return len(self.states)
+
+
+def edge_list(dfa):
+    """
+    number the states of Q and the symbols of Σ in their order
+    and list the transitions of δ as (q, a, t), return the numbering
+    of states and symbols, the start and the list of edges
+    """
+
+    states = {q: i for i, q in enumerate(dfa.Q)}
+    symbols = {a: i for i, a in enumerate(dfa.Σ)}
+    start = states.setdefault(dfa.q0, len(states))
+
+    edges = []
+    for (q, a), target in dfa.δ.items():
+        if target == "-":
+            continue
+        edges.append((states.setdefault(q, len(states)),
+                      symbols.setdefault(a, len(symbols)),
+                      states.setdefault(target, len(states))))
+    return states, symbols, start, edges
+
+
+def incoming_index(n, edges):
+    """
+    index the edges (q, a, t) of a DFA over n states by target,
+    as CompiledDFA.incoming, the work follows the number of edges
+    """
+
+    edges = list(edges)
+    offsets = array('i', [0]) * (n + 1)
+    for _, _, t in edges:
+        offsets[t + 1] += 1
+    for i in range(n):
+        offsets[i + 1] += offsets[i]
+
+    sources = array('i', [0]) * offsets[-1]
+    symbols = array('i', [0]) * offsets[-1]
+    fill = array('i', offsets)
+    for q, a, t in edges:
+        sources[fill[t]] = q
+        symbols[fill[t]] = a
+        fill[t] += 1
+
+    return offsets, sources, symbols
+
+
+def refine(n, incoming, labels):
+    """
+    refine the n states grouped by labels over the incoming index,
+    see CompiledDFA.partition
+    """
+
+    offsets, sources, symbols = incoming
+    ids = {}
+    block = [ids.setdefault(label, len(ids)) for label in labels]
+
+    elems = sorted(range(n), key=block.__getitem__)
+    loc = [0] * n
+    for i, q in enumerate(elems):
+        loc[q] = i
+    first, past = [0] * len(ids), [0] * len(ids)
+    for i in range(n - 1, -1, -1):
+        first[block[elems[i]]] = i
+    for i in range(n):
+        past[block[elems[i]]] = i + 1
+    marked = [0] * len(ids)
+
+    # every initial block is a splitter, δ may be partial
+    work = list(range(len(ids)))
+    while work:
+        splitter = work.pop()
+        preimages = {}
+        for t in elems[first[splitter]:past[splitter]]:
+            for i in range(offsets[t], offsets[t + 1]):
+                preimages.setdefault(symbols[i], []).append(sources[i])
+
+        for group in preimages.values():
+            touched = []
+            for q in group:
+                b = block[q]
+                j = first[b] + marked[b]
+                if loc[q] < j:
+                    continue  # already marked
+                r = elems[j]
+                elems[j], elems[loc[q]] = q, r
+                loc[r], loc[q] = loc[q], j
+                if marked[b] == 0:
+                    touched.append(b)
+                marked[b] += 1
+
+            for b in touched:
+                size, k = past[b] - first[b], marked[b]
+                marked[b] = 0
+                if k == size:
+                    continue
+
+                new = len(first)
+                if k <= size - k:
+                    first.append(first[b])
+                    past.append(first[b] + k)
+                    first[b] += k
+                else:
+                    first.append(first[b] + k)
+                    past.append(past[b])
+                    past[b] = first[b] + k
+                marked.append(0)
+                for i in range(first[new], past[new]):
+                    block[elems[i]] = new
+                work.append(new)
+
+    # number the blocks in the order they first appear
+    ids = {}
+    return [ids.setdefault(b, len(ids)) for b in block]
+
+
+def live_states(incoming, accepting):
+    """
+    1 for the states which reach an accepting one over the incoming
+    index, see CompiledDFA.live
+    """
+
+    offsets, sources, _ = incoming
+    live = bytearray(accepting)
+    stack = [q for q in range(len(live)) if live[q]]
+    while stack:
+        t = stack.pop()
+        for i in range(offsets[t], offsets[t + 1]):
+            q = sources[i]
+            if not live[q]:
+                live[q] = 1
+                stack.append(q)
+    return bytes(live)
+
+
+def _merge_columns(n, m, table):
+    """
+    group the columns of the n × m table which are equal in every
+    row, return the group of every column and the table over groups
+    """
+
+    ids, groups = {}, []
+    for a in range(m):
+        groups.append(ids.setdefault(table[a::m].tobytes(), len(ids)))
+
+    k = len(ids)
+    if k == m:
+        return groups, table
+    merged = array('i', [-1]) * (n * k)
+    for a, c in enumerate(groups):
+        merged[c::k] = table[a::m]
+    return groups, merged
+
+
+_python_cache = {}
+
+_worker_dfa = None
+
+
+def _init_worker(dfa):
+    global _worker_dfa
+    _worker_dfa = dfa
+
+
+def _chunk_mapping(chunk):
+    if not isinstance(chunk, tuple):
+        return _worker_dfa.mapping(chunk)
+
+    path, start, stop = chunk
+    with open(path, "rb") as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            with memoryview(data) as view, view[start:stop] as part:
+                return _worker_dfa.mapping(part)
+
+
+@dataclass(frozen=True)
+class PackedDFA:
+    """
+    Row displaced (comb vector) table of a CompiledDFA, as in lex
+
+    every state keeps its most common target as default[q] and only
+    the other entries of its row, the rows are laid over each other
+    in next and check shifted by base[q] so that no two collide
+
+        i = base[q] + c
+        δ(q, c) = next[i] if check[i] == q else default[q]
+
+    """
+
+    states: tuple
+    symbols: tuple
+    classes: tuple
+    base: array
+    next: array
+    check: array
+    default: array
+    accepting: bytes
+    start: int
+
+    symbol_index: dict = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "symbol_index",
+                           dict(zip(self.symbols, self.classes)))
+
+    @classmethod
+    def from_compiled(cls, dfa):
+        """
+        the rows are placed from the fullest one down, each at the
+        first base where all of its entries find free slots, looking
+        a bounded number of bases ahead before it goes to the end
+        """
+
+        n, m, table = len(dfa.states), dfa.width, dfa.table
+
+        default = array('i', [-1]) * n
+        rows = []
+        for q in range(n):
+            row = table[q * m:(q + 1) * m]
+            counts = Counter(row)
+            d = max(counts, key=counts.__getitem__, default=-1)
+            default[q] = d
+            rows.append([(c, t) for c, t in enumerate(row) if t != d])
+
+        base = array('i', [0]) * n
+        check, next = array('i'), array('i')
+        free = 0
+        for q in sorted(range(n), key=lambda q: -len(rows[q])):
+            entries = rows[q]
+            if not entries:
+                continue
+
+            # a few tries from the first free slot, then past the end
+            first = max(free - entries[0][0], 0)
+            for b in range(first, first + 64):
+                if all(b + c >= len(check) or check[b + c] < 0 for c, _ in entries):
+                    break
+            else:
+                b = len(check)
+
+            size = b + entries[-1][0] + 1
+            if size > len(check):
+                check.extend(array('i', [-1]) * (size - len(check)))
+                next.extend(array('i', [-1]) * (size - len(next)))
+            for c, t in entries:
+                check[b + c], next[b + c] = q, t
+            base[q] = b
+            while free < len(check) and check[free] >= 0:
+                free += 1
+
+        # every base[q] + c has to be a valid index
+        size = max(base, default=0) + m
+        if size > len(check):
+            check.extend(array('i', [-1]) * (size - len(check)))
+            next.extend(array('i', [-1]) * (size - len(next)))
+
+        return cls(dfa.states, dfa.symbols, dfa.classes, base, next,
+                   check, default, dfa.accepting, dfa.start)
+
+    def run(self, word):
+        """
+        return the state reached after reading the word
+        or -1 if the automata got stuck
+        """
+
+        base, next, check, default = self.base, self.next, self.check, self.default
+        symbols = self.symbol_index
+        q = self.start
+        for a in word:
+            c = symbols.get(a)
+            if c is None:
+                c = symbols.get(str(a))
+                if c is None:
+                    return -1
+            i = base[q] + c
+            q = next[i] if check[i] == q else default[q]
+            if q < 0:
+                return -1
+        return q
+
+    def test(self, word):
+        q = self.run(word)
+        return q >= 0 and self.accepting[q] == 1
+
+    @property
+    def nbytes(self):
+        return sum(len(a) * a.itemsize for a in
+                   (self.base, self.next, self.check, self.default))
+
+    def __len__(self):
+        return len(self.states)
+
+
+@dataclass(frozen=True)
+class ByteDFA:
+    """
+    Deterministic finite automata over bytes
+
+    every state has a row of 256 targets, one per byte value
+
+        table[q * 256 + b] = target state or -1 (no path)
+
+    bytes, bytearray and memoryview are read in place, so frames
+    can be matched straight out of a buffer without decoding it,
+    a byte b is the symbol chr(b) as in CompiledDFA
+
+    """
+
+    states: tuple
+    table: array
+    accepting: bytes
+    start: int
+
+    @classmethod
+    def from_dfa(cls, dfa, encoding=None):
+        """
+        with no encoding every symbol of Σ must be a single character
+        chr(b) standing for the byte b, otherwise each symbol stands for
+        its bytes in the encoding, a symbol of several bytes (UTF-8)
+        goes through new states named (q, prefix) spelling it byte by byte
+        """
+
+        compiled = dfa.compile()
+        n, m = len(compiled.states), compiled.width
+
+        encoded = []
+        for a in compiled.symbols:
+            if encoding is not None:
+                encoded.append(a.encode(encoding))
+            elif len(a) == 1 and ord(a) < 256:
+                encoded.append(bytes([ord(a)]))
+            else:
+                raise ValueError(f"symbol {a!r} is not a single byte chr(0..255)")
+
+        states = list(compiled.states)
+        table = array('i', [-1]) * (n * 256)
+        inner = {}
+
+        for q in range(n):
+            for a, word in zip(compiled.classes, encoded):
+                t = compiled.table[q * m + a]
+                if t < 0 or not word:
+                    continue
+                p = q
+                for i in range(1, len(word)):
+                    prefix = (compiled.states[q], word[:i])
+                    r = table[p * 256 + word[i - 1]]
+                    if r < 0:
+                        r = inner.setdefault(prefix, len(states))
+                        if r == len(states):
+                            states.append(prefix)
+                            table.extend(array('i', [-1]) * 256)
+                        table[p * 256 + word[i - 1]] = r
+                    elif r < n:
+                        raise ValueError(f"{word!r} has a symbol as its prefix")
+                    p = r
+                if table[p * 256 + word[-1]] not in (-1, t):
+                    raise ValueError(f"{word!r} is a prefix of another symbol")
+                table[p * 256 + word[-1]] = t
+
+        accepting = compiled.accepting + bytes(len(states) - n)
+        return cls(tuple(states), table, accepting, compiled.start)
+
+    def run(self, data, state=None):
+        """
+        return the state reached after reading the bytes-like data from
+        state (the start by default) or -1 if the automata got stuck,
+        runs can be resumed chunk by chunk by passing the state back
+        """
+
+        table = self.table
+        q = self.start if state is None else state
+        if q < 0:
+            return -1
+        with memoryview(data) as view, view.cast('B') as data:
+            for b in data:
+                q = table[(q << 8) | b]
+                if q < 0:
+                    return -1
+        return q
+
+    def test(self, data):
+        q = self.run(data)
+        return q >= 0 and self.accepting[q] == 1
+
+    def match(self, data):
+        """
+        return the length of the longest prefix of the data
+        which is accepted or -1 if there is none
+        """
+
+        table, accepting = self.table, self.accepting
+        q = self.start
+        longest = 0 if accepting[q] else -1
+        with memoryview(data) as view, view.cast('B') as data:
+            for n, b in enumerate(data, 1):
+                q = table[(q << 8) | b]
+                if q < 0:
+                    break
+                if accepting[q]:
+                    longest = n
+        return longest
+
+    def __len__(self):
+        return len(self.states)
+
+
+@dataclass(frozen=True)
+class CompiledSFA:
+    """
+    Compiled deterministic symbolic automata
+
+    the edges of every state are cut into sorted disjoint intervals
+    of code points, a symbol is looked up by bisection
+
+        lows[q][i] <= ord(a) <= highs[q][i]  →  targets[q][i]
+
+    """
+
+    states: tuple
+    lows: tuple
+    highs: tuple
+    targets: tuple
+    accepting: bytes
+    start: int
+
+    @classmethod
+    def from_sfa(cls, sfa):
+        """
+        sfa has to be deterministic (see SFA.toDFA)
+        """
+
+        states = {q: i for i, q in enumerate(sfa.Q)}
+        start = states.setdefault(sfa.q0, len(states))
+
+        rows = {}
+        for (q, label), targets in sfa.δ.items():
+            if label == "ε" or not targets:
+                continue
+            t = states.setdefault(targets[0], len(states))
+            row = rows.setdefault(states.setdefault(q, len(states)), [])
+            row.extend((lo, hi, t) for lo, hi in label)
+
+        lows, highs, targets = [], [], []
+        for q in range(len(states)):
+            row = sorted(rows.get(q, ()))
+            lows.append(array('i', (lo for lo, _, _ in row)))
+            highs.append(array('i', (hi for _, hi, _ in row)))
+            targets.append(array('i', (t for _, _, t in row)))
+
+        accepting = bytearray(len(states))
+        for qf in sfa.F:
+            if qf in states:
+                accepting[states[qf]] = 1
+
+        return cls(tuple(states), tuple(lows), tuple(highs), tuple(targets),
+                   bytes(accepting), start)
+
+    def run(self, word):
+        """
+        return the state reached after reading the word
+        or -1 if the automata got stuck
+        """
+
+        lows, highs, targets = self.lows, self.highs, self.targets
+        q = self.start
+        for a in word:
+            c = ord(a)
+            i = bisect_right(lows[q], c) - 1
+            if i < 0 or c > highs[q][i]:
+                return -1
+            q = targets[q][i]
+        return q
+
+    def test(self, word):
+        q = self.run(word)
+        return q >= 0 and self.accepting[q] == 1
+
+    def __len__(self):
+        return len(self.states)
+
+
+@dataclass(frozen=True)
+class CompiledNFA:
+    """
+    Compiled non-deterministic finite automata
+
+    states and symbols are numbered densely from 0 and a set of
+    states is an int bitmask, state q being the bit 1 << q
+
+        successors[a][q] = bitmask of δ(q, a)
+
+    """
+
+    states: tuple
+    symbols: tuple
+    successors: tuple
+    accepting: int
+    start: int
+
+    symbol_index: dict = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "symbol_index",
+                           {a: i for i, a in enumerate(self.symbols)})
+
+    @classmethod
+    def from_nfa(cls, nfa):
+        states = {q: i for i, q in enumerate(nfa.Q)}
+        symbols = {a: i for i, a in enumerate(nfa.Σ)}
+
+        edges = []
+        for (q, a), targets in nfa.δ.items():
+            for target in targets:
+                edges.append((states.setdefault(q, len(states)),
+                              symbols.setdefault(a, len(symbols)),
+                              states.setdefault(target, len(states))))
+        start = 1 << states.setdefault(nfa.q0, len(states))
+
+        successors = [[0] * len(states) for _ in symbols]
+        for q, a, target in edges:
+            successors[a][q] |= 1 << target
+
+        accepting = 0
+        for qf in nfa.F:
+            if qf in states:
+                accepting |= 1 << states[qf]
+
+        return cls(tuple(states), tuple(symbols),
+                   tuple(map(tuple, successors)), accepting, start)
+
+    def step(self, mask, a):
+        """
+        return the bitmask of states reachable from the states
+        of mask under the symbol number a
+        """
+
+        row = self.successors[a]
+        result = 0
+        while mask:
+            low = mask & -mask
+            result |= row[low.bit_length() - 1]
+            mask ^= low
+        return result
+
+    def run(self, word):
+        """
+        simulate the automata on the word, return the bitmask
+        of the states it ends in (0 once no state is left)
+        """
+
+        symbols, step = self.symbol_index, self.step
+        mask = self.start
+        for a in word:
+            i = symbols.get(a)
+            if i is None:
+                i = symbols.get(str(a))
+                if i is None:
+                    return 0
+            mask = step(mask, i)
+            if not mask:
+                return 0
+        return mask
+
+    def test(self, word):
+        return (self.run(word) & self.accepting) != 0
+
+    def determinize(self):
+        """
+        subset construction from the start mask with a deque worklist,
+        return the reached masks and the CompiledDFA over them, its
+        state i (named "i") standing for masks[i]
+        """
+
+        ids = {self.start: 0}
+        masks = [self.start]
+        edges = []
+        work = deque(masks)
+
+        while work:
+            M = work.popleft()
+            for a in range(len(self.symbols)):
+                N = self.step(M, a)
+                if N not in ids:
+                    ids[N] = len(masks)
+                    masks.append(N)
+                    work.append(N)
+                edges.append(ids[N])
+
+        accepting = bytes(1 if M & self.accepting else 0 for M in masks)
+        return masks, CompiledDFA.from_table(tuple(map(str, range(len(masks)))),
+                                             self.symbols, array('i', edges),
+                                             accepting, 0)
+
+    def includes(self, other, witness=False):
+        """
+        tell whether L(other) ⊆ L(self) without determinizing self
+
+        the pairs (p, S) of a state p of other and the set S of states
+        of self reached on the same word are walked breadth first, a
+        counterexample ends in p ∈ F of other with S ∩ F = Ø, a pair
+        (p, S) is dropped when (p, T) with T ⊆ S was already met since
+        whatever S still misses T misses as well, so only an antichain
+        of the subsets is ever explored
+
+        return True or False, with witness=True (result, word) where
+        word is a shortest tuple of symbols in L(other) - L(self)
+        or None if there is none
+        """
+
+        A, B = self, other
+        translate = [A.symbol_index.get(a) for a in B.symbols]
+
+        antichain = {}
+
+        def minimal(p, S):
+            chain = antichain.setdefault(p, [])
+            if any(T & ~S == 0 for T in chain):
+                return False
+            chain[:] = [T for T in chain if S & ~T != 0]
+            chain.append(S)
+            return True
+
+        came = {}
+        work = deque()
+        for p in bits(B.start):
+            if minimal(p, A.start):
+                came[p, A.start] = None
+                work.append((p, A.start))
+
+        while work:
+            p, S = work.popleft()
+            if B.accepting >> p & 1 and not S & A.accepting:
+                if not witness:
+                    return False
+                word, pair = [], (p, S)
+                while came[pair] is not None:
+                    pair, a = came[pair]
+                    word.append(a)
+                return False, tuple(reversed(word))
+
+            for b, a in enumerate(translate):
+                targets = B.step(1 << p, b)
+                if not targets:
+                    continue
+                S2 = A.step(S, a) if a is not None and S else 0
+                for p2 in bits(targets):
+                    if (p2, S2) not in came and minimal(p2, S2):
+                        came[p2, S2] = ((p, S), B.symbols[b])
+                        work.append((p2, S2))
+
+        return (True, None) if witness else True
+
+    def is_universal(self, witness=False):
+        """
+        tell whether every word over the symbols is accepted, that is
+        the inclusion of the one state automata of all of the words,
+        with witness=True (result, word) for a shortest rejected word
+        """
+
+        everything = CompiledNFA(("Σ*",), self.symbols,
+                                 tuple((1,) for _ in self.symbols), 1, 1)
+        return self.includes(everything, witness)
+
+    def names(self, mask):
+        """
+        materialize the bitmask as a list of state names
+        """
+
+        return [self.states[q] for q in bits(mask)]
+
+
+@dataclass(frozen=True)
+class CompiledEFA(CompiledNFA):
+    """
+    Compiled non-deterministic finite automata with ε steps
+
+    same tables as CompiledNFA without the ε column, plus
+
+        closure[q] = bitmask of Dε(q)
+
+    the start mask is closed and every step applies the closure
+    to the states reached, so a state set is always ε-closed
+    """
+
+    closure: tuple = ()
+
+    @classmethod
+    def from_efa(cls, efa):
+        states, index, closure = efa.δ.closures()
+        states = dict(index)
+        closure = list(closure)
+        symbols = {a: i for i, a in enumerate(a for a in efa.Σ if a != "ε")}
+
+        edges = []
+        for (q, a), targets in efa.δ.items():
+            if a == "ε":
+                continue
+            for target in targets:
+                edges.append((states.setdefault(q, len(states)),
+                              symbols.setdefault(a, len(symbols)),
+                              states.setdefault(target, len(states))))
+        states.setdefault(efa.q0, len(states))
+        closure += [1 << q for q in range(len(closure), len(states))]
+
+        successors = [[0] * len(states) for _ in symbols]
+        for q, a, target in edges:
+            successors[a][q] |= 1 << target
+
+        accepting = 0
+        for qf in efa.F:
+            if qf in states:
+                accepting |= 1 << states[qf]
+
+        return cls(tuple(states), tuple(symbols),
+                   tuple(map(tuple, successors)), accepting,
+                   closure[states[efa.q0]], tuple(closure))
+
+    def close(self, mask):
+        result = 0
+        for q in bits(mask):
+            result |= self.closure[q]
+        return result
+
+    def step(self, mask, a):
+        return self.close(super().step(mask, a))
+
+
+class LazyDFA:
+    """
+    Lazily determinized CompiledNFA (as in RE2)
+
+    DFA states are bitmasks of NFA states, they are built on demand
+    while matching and kept in a cache of at most max_states states,
+    once the cache is full it is flushed and starts over
+
+    hits, misses and flushes count the transitions found in the
+    cache, the transitions computed and the flushes of the cache
+    """
+
+    class State:
+        __slots__ = ("mask", "next", "accepting")
+
+        def __init__(self, mask, symbols, accepting):
+            self.mask = mask
+            self.next = [None] * symbols
+            self.accepting = accepting
+
+    def __init__(self, nfa, max_states=10000):
+        self.nfa = nfa
+        self.max_states = max_states
+        self.cache = {}
+        self.hits = self.misses = self.flushes = 0
+
+    def state(self, mask):
+        state = self.cache.get(mask)
+        if state is None:
+            if len(self.cache) >= self.max_states:
+                self.cache.clear()
+                self.flushes += 1
+            state = LazyDFA.State(mask, len(self.nfa.symbols),
+                                  (mask & self.nfa.accepting) != 0)
+            self.cache[mask] = state
+        return state
+
+    def run(self, word):
+        """
+        return the DFA state reached after reading the word
+        or None if the automata got stuck
+        """
+
+        symbols = self.nfa.symbol_index
+        state = self.state(self.nfa.start)
+        for a in word:
+            i = symbols.get(a)
+            if i is None:
+                i = symbols.get(str(a))
+                if i is None:
+                    return None
+            target = state.next[i]
+            if target is None:
+                self.misses += 1
+                target = self.state(self.nfa.step(state.mask, i))
+                state.next[i] = target
+            else:
+                self.hits += 1
+            state = target
+            if state.mask == 0:
+                return None
+        return state
+
+    def test(self, word):
+        state = self.run(word)
+        return state is not None and state.accepting
+
+    def __len__(self):
+        return len(self.cache)
+
+
+class Stream:
+    """
+    Resumable matcher over a CompiledDFA
+
+        matcher = dfa.stream()
+        matcher.feed(chunk)
+        ...
+        matcher.accepting
+
+    chunks are str or bytes-like (bytes, bytearray, memoryview),
+    bytes are read through byte_index straight from the buffer
+    without decoding or copying it
+    """
+
+    def __init__(self, dfa):
+        self.dfa = dfa
+        self.state = dfa.start
+        self.consumed = 0
+
+    def feed(self, chunk):
+        self.consumed += len(chunk)
+        if self.state < 0:
+            return self
+
+        dfa = self.dfa
+        table, m, q = dfa.table, dfa.width, self.state
+        if isinstance(chunk, str):
+            symbols = dfa.symbol_index
+            for a in chunk:
+                i = symbols.get(a)
+                if i is None:
+                    q = -1
+                    break
+                q = table[q * m + i]
+                if q < 0:
+                    break
+        else:
+            columns = dfa.byte_index
+            with memoryview(chunk) as view, view.cast('B') as data:
+                for b in data:
+                    i = columns[b]
+                    if i < 0:
+                        q = -1
+                        break
+                    q = table[q * m + i]
+                    if q < 0:
+                        break
+
+        self.state = q
+        return self
+
+    def feed_file(self, path, chunk_size=1 << 20):
+        """
+        feed the whole file through mmap, chunk by chunk
+        """
+
+        with open(path, "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return self
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                with memoryview(data) as view:
+                    for start in range(0, len(view), chunk_size):
+                        with view[start:start + chunk_size] as chunk:
+                            self.feed(chunk)
+        return self
+
+    @property
+    def accepting(self):
+        return self.state >= 0 and self.dfa.accepting[self.state] == 1
+
+    @property
+    def stuck(self):
+        return self.state < 0
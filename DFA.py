@@ -1,7 +1,9 @@
 import sys
 import types
+from collections import deque
 
 from utils import Set
+from Compiled import CompiledDFA, ByteDFA, edge_list, incoming_index, live_states, refine
 import FA
 
 
@@ -44,15 +46,14 @@ class DFA(FA.FA):
 
         super().table_header("DETERMINISTIC FINITE AUTOMATA")
 
-        widths = [max([len(key[0]) - key[0].count("̂") for key in self.δ])]
+        widths = [max([len(qi) - qi.count("̂") for qi in self.Q])]
         for a in self.Σ:
-            widths.append(max(max([len(str(self.δ.get((qi, a), "")))
+            widths.append(max(max([len(str(self.δ.get((qi, a), "-")))
                                    for qi in self.Q]), len(a)))
 
         data = [("", *self.Σ)]
         for qi in self.Q:
-            data.append([qi] + [str(self.δ.get((qi, a), "Ø")[0])
-                                for a in self.Σ])
+            data.append([qi] + [str(self.δ[qi, a]) for a in self.Σ])
 
         def sep():
             print("+" + "+".join([f"-{'-' * w}-" for w in widths]) + "+")
@@ -68,95 +69,236 @@ class DFA(FA.FA):
             sep()
             print_row(0)
             sep()
-            for i in range(1, len(self.δ.group()) + 1):
+            for i in range(1, len(self.Q) + 1):
                 print_row(i)
             sep()
 
         super().table_body(print_content)
 
-    def intersept(self, other):
+    def product(self, other, accept, minimize=False):
         """
-        create a new DFA which has:
-            Q3 = Q1 × Q2
-            F3 = F1 × F2
-            q3 = (q1, q2)
+        create a new DFA over the pairs of states reachable from (q1, q2)
+            q3 = 0 standing for (q1, q2)
             δ3((p, q), a) = (δ1(p, a), δ2(q, a))
+            (p, q) ∈ F3 iff accept(p ∈ F1, q ∈ F2)
+
+        an undefined transition leads to the dead state None, a pair
+        is dropped once it can no longer reach F3, the pair of two
+        dead states is kept only when accept(False, False) holds
+
+        the states are numbered in the order of discovery and
+        M3.pairs maps each of them back to its (p, q), with minimize
+        the minimal DFA of the product is returned instead
         """
+        import DFA
 
-        Q3 = self.Q.cross(other.Q)
-        F3 = self.F.cross(other.F)
-        q3 = (self.q0, other.q0)
+        A, B = self.compile(), other.compile()
+        mA, mB = A.width, B.width
+        Σ = self.Σ | other.Σ
+
+        # symbols of the same pair of classes always lead to the same pair
+        columns = [(a, (A.symbol_index.get(a), B.symbol_index.get(a))) for a in Σ]
+        classes = list(dict.fromkeys(pair for a, pair in columns))
+
+        # with one side dead the pair is decided by the other side only
+        alive_without_p = accept(False, True) or accept(False, False)
+        alive_without_q = accept(True, False) or accept(False, False)
+        alive_with_neither = accept(False, False)
+
+        start = (A.start, B.start)
+        ids = {start: 0}
+        pairs = [start]
+        work = deque(pairs)
+        transitions = {}
+
+        while work:
+            p, q = work.popleft()
+            i = ids[p, q]
+
+            targets = {}
+            for ca, cb in classes:
+                p2 = A.table[p * mA + ca] if p >= 0 and ca is not None else -1
+                q2 = B.table[q * mB + cb] if q >= 0 and cb is not None else -1
+                if (p2 < 0 and q2 < 0 and not alive_with_neither or
+                        p2 < 0 and not alive_without_p or
+                        q2 < 0 and not alive_without_q):
+                    continue
+
+                if (p2, q2) not in ids:
+                    ids[p2, q2] = len(pairs)
+                    pairs.append((p2, q2))
+                    work.append((p2, q2))
+                targets[ca, cb] = str(ids[p2, q2])
 
-        δ3 = δ()
+            for a, pair in columns:
+                if pair in targets:
+                    transitions[str(i), a] = Set(targets[pair])
 
-        for (p, q) in Q3:
-            for a in self.Σ:
-                if self.δ[p, a] != "-" and other.δ[q, a] != "-":
-                    δ3[f"{(p, q)}", a] = f"{(self.δ[p, a], other.δ[q, a])}"
+        F3 = Set(str(i) for i, (p, q) in enumerate(pairs)
+                 if accept(p >= 0 and A.accepting[p] == 1,
+                           q >= 0 and B.accepting[q] == 1))
 
-        M3 = DFA(Q3, self.Σ, δ3, q3, F3)
-        return M3
+        M3 = DFA(Set(map(str, range(len(pairs)))), Σ, DFA.δ(transitions), "0", F3)
+        M3.pairs = {str(i): (A.states[p] if p >= 0 else None,
+                             B.states[q] if q >= 0 else None)
+                    for i, (p, q) in enumerate(pairs)}
+        return M3.minimize() if minimize else M3
+
+    def intersept(self, other, minimize=False):
+        """
+        create a new DFA which has:
+            Q3 ⊆ Q1 × Q2 reachable from q3
+            F3 = F1 × F2
+            q3 = (q1, q2)
+            δ3((p, q), a) = (δ1(p, a), δ2(q, a))
+        """
+
+        return self.product(other, lambda p, q: p and q, minimize)
 
     def __and__(self, other):
         return self.intersept(other)
 
-    def union(self, other):
+    def union(self, other, minimize=False):
         """
         return a new DFA which has:
-            Q3 = Q1 × Q2
+            Q3 ⊆ (Q1 ∪ {None}) × (Q2 ∪ {None}) reachable from q3
             F3 = F1 × Q2 ∪ Q1 × F2
             q3 = (q1, q2)
             δ3((p, q), a) = (δ1(p, a), δ2(q, a))
         """
 
-        M3 = self.intersept(other)
-        M3.F = self.F.cross(other.Q).union(self.Q.cross(other.F))
-        return M3
+        return self.product(other, lambda p, q: p or q, minimize)
 
     def __or__(self, other):
         return self.union(other)
 
-    def minimize(self):
+    def complement(self, minimize=False):
+        """
+        return a new DFA accepting the words over Σ which are not
+        accepted, the missing transitions lead to an accepting sink
+            F3 = Q1 - F1 (∪ {sink})
+        """
+
+        return self.product(self, lambda p, q: not p, minimize)
+
+    def __invert__(self):
+        return self.complement()
+
+    def difference(self, other, minimize=False):
+        """
+        return a new DFA accepting L1 - L2
+            F3 = F1 × ((Q2 ∪ {None}) - F2)
+        """
+
+        return self.product(other, lambda p, q: p and not q, minimize)
+
+    def __sub__(self, other):
+        return self.difference(other)
+
+    def symmetric_difference(self, other, minimize=False):
+        """
+        return a new DFA accepting the words of just one of L1 and L2
+            F3 = F1 × ((Q2 ∪ {None}) - F2) ∪ ((Q1 ∪ {None}) - F1) × F2
+        """
+
+        return self.product(other, lambda p, q: p != q, minimize)
+
+    def __xor__(self, other):
+        return self.symmetric_difference(other)
+
+    def equivalent(self, other, witness=False):
+        """
+        tell whether both automata accept the same language without
+        minimizing them, with witness=True return (result, word) where
+        word is a shortest word accepted by only one of them (or None),
+        see CompiledDFA.equivalent
+        """
+        return self.compile().equivalent(other.compile(), witness)
+
+    def minimize(self, reference=False, complete=False):
         """
         in order to minimize folow these steps:
-            1. add hell if necessary
-            2. remove unreachable nodes
+            1. remove unreachable nodes
+            2. remove dead nodes, or add hell if complete
             3. start reduction
             4. order properly
+
+        the reduction is Hopcroft's partition refinement, the former
+        group table reduction is kept as reference=True for cross-checking
+
+        the result is a partial DFA, the missing transitions are left
+        out instead of going to a dead state, complete=True gives the
+        complete minimal DFA with the hell ⊗ merged into one state
+
+        the automata is left untouched, every step builds a new one
+        (or passes on its input if there is nothing to do) and the
+        values of the alphabet Σ are shared with the result instead
+        of being copied, copy on write (Set.share)
         """
 
-        self._add_hell()
-        self._remove_unreachables()
-        reduced = self._reduce()
+        reachable = self._remove_unreachables()
+        reachable = reachable._add_hell() if complete else reachable._remove_dead()
+
+        if reference:
+            reduced = reachable._add_hell()._reduce()
+            reduced = reduced if complete else reduced._remove_dead()
+        else:
+            reduced = reachable._hopcroft()
+
         canonized = reduced._canonize()
         return canonized
 
     def _remove_unreachables(self):
+        import DFA
+
         unreachables = self.δ.unreachables(self.q0)
+        if not any(q in self.Q for q in unreachables):
+            return self
+
+        δ = DFA.δ()
+        for (qi, a), target in self.δ.items():
+            if qi not in unreachables:
+                δ[qi, a] = target
+
+        return DFA(self.Q - unreachables, self.Σ.share(), δ, self.q0, self.F - unreachables)
+
+    def _remove_dead(self):
+        """
+        drop the states from which no accepting state can be reached
+        together with the transitions into them, a dead initial state
+        stays without any transitions
+        """
+        import DFA
 
-        self.Q -= unreachables
-        self.F -= unreachables
+        states, _, _, edges = edge_list(self)
+        accepting = bytes(q in self.F for q in states)
+        live = live_states(incoming_index(len(states), edges), accepting)
+        dead = Set(q for q, alive in zip(states, live) if not alive)
+        if dead.empty():
+            return self
 
-        for unreachable in unreachables:
-            for a in self.Σ:
-                del self.δ[unreachable, a]
+        δ = DFA.δ()
+        for (qi, a), target in self.δ.items():
+            if qi not in dead and target not in dead:
+                δ[qi, a] = target
 
-        self.δ.Q = self.Q
+        Q = Set(q for q in self.Q if q not in dead or q == self.q0)
+        return DFA(Q, self.Σ.share(), δ, self.q0, self.F.copy())
 
     def _add_hell(self):
-        addedHell = False
-        for qi in self.Q:
-            for a in self.Σ:
-                if self.δ.get((qi, a)) is not None and self.δ[qi, a] != "-":
-                    continue
+        import DFA
+
+        missing = [(qi, a) for qi in self.Q for a in self.Σ if self.δ[qi, a] == "-"]
+        if not missing:
+            return self
 
-                if not addedHell:
-                    addedHell = True
-                    self.Q.add("⊗")
-                    for a2 in self.Σ:
-                        self.δ["⊗", a2] = "⊗"
+        δ = self.δ.copy()
+        for a in self.Σ:
+            δ["⊗", a] = "⊗"
+        for qi, a in missing:
+            δ[qi, a] = "⊗"
 
-                self.δ[qi, a] = "⊗"
+        return DFA(self.Q | Set("⊗"), self.Σ.share(), δ, self.q0, self.F.copy())
 
     def _reduce(self, imax=None):
         from utils import roman
@@ -166,10 +308,11 @@ class DFA(FA.FA):
             """
             split into two groups
             I  - non terminal
-            II - terminal
+            II - terminal (I when every state is terminal)
             """
+            terminal = roman(2) if self.Q - self.F else roman(1)
             groups = {
-                qi: roman(1) if qi not in self.F else roman(2)
+                qi: roman(1) if qi not in self.F else terminal
                 for qi in self.Q
             }
 
@@ -216,7 +359,31 @@ class DFA(FA.FA):
             δ[groups[qi], a] = target
 
         F = Set(groups[qf] for qf in self.F)
-        return DFA(Q, self.Σ, δ, q0, F)
+        return DFA(Q, self.Σ.share(), δ, q0, F)
+
+    def _hopcroft(self):
+        """
+        refine and merge over the list of transitions of δ, so a partial
+        automata costs its transitions and not its states times symbols
+        """
+        import DFA
+
+        states, symbols, start, edges = edge_list(self)
+        block = refine(len(states), incoming_index(len(states), edges),
+                       [q in self.F for q in states])
+
+        names = list(map(str, range(max(block, default=-1) + 1)))
+        symbols = list(symbols)
+        merged = {}
+        for q, a, t in edges:
+            merged[block[q], a] = block[t]
+
+        δ = DFA.δ()
+        for (b, a), c in sorted(merged.items()):
+            δ[names[b], symbols[a]] = names[c]
+
+        F = Set(names[block[states[qf]]] for qf in self.F if qf in states)
+        return DFA(Set(names), self.Σ.share(), δ, names[block[start]], F)
 
     def _canonize(self):
         import DFA
@@ -231,15 +398,70 @@ class DFA(FA.FA):
         q0 = letterMapping[self.q0]
         F = Set(letterMapping[qf] for qf in self.F)
 
-        return DFA(Q, self.Σ, δ, q0, F)
+        return DFA(Q, self.Σ.share(), δ, q0, F)
+
+    def compile(self):
+        """
+        return an immutable CompiledDFA with integer states and symbols,
+        it is built once and reused until the automata changes
+        """
+        return self.cached("compiled", lambda: CompiledDFA.from_dfa(self))
+
+    def compile_packed(self):
+        """
+        return the compiled table compressed by row displacement
+        into a PackedDFA, for large automata with sparse rows
+        """
+        return self.cached("packed", lambda: self.compile().pack())
+
+    def compile_bytes(self, encoding=None):
+        """
+        return a ByteDFA with a 256-wide row per state matching bytes,
+        bytearray and memoryview in place, the byte b is the symbol
+        chr(b) or with an encoding the symbols are matched by their bytes
+        """
+        return self.cached(f"bytes:{encoding}",
+                           lambda: ByteDFA.from_dfa(self, encoding))
 
     def test(self, word):
-        word = list(word)
-        qi = self.q0
-        while len(word) > 0:
-            a = word.pop(0)
-            qi = self.δ[qi, a]
-        return qi in self.F
+        return self.compile().test(word)
+
+    def to_python(self):
+        """
+        return a specialized Python function word → bool generated
+        from the compiled table, see CompiledDFA.to_python
+        """
+        return self.compile().to_python()
+
+    def test_many(self, words):
+        """
+        test a batch of words at once over the compiled table,
+        return a boolean NumPy array (NFA.test_many returns a list)
+        """
+        return self.compile().test_many(words)
+
+    def test_parallel(self, data, workers=None):
+        """
+        test a huge word split among worker processes, each chunk is
+        turned into a state → state mapping and the mappings composed
+        """
+        return self.compile().test_parallel(data, workers)
+
+    def finditer(self, text, longest=True):
+        """
+        yield the (start, end) spans of the text matched by the
+        automata, leftmost-longest or leftmost-first with longest=False
+        """
+        return self.compile().finditer(text, longest)
+
+    def find_all(self, text, longest=True):
+        return self.compile().find_all(text, longest)
+
+    def stream(self):
+        """
+        return a resumable matcher fed chunk by chunk, see Compiled.Stream
+        """
+        return self.compile().stream()
 
 
 class δ(FA.δ):
@@ -266,20 +488,27 @@ class δ(FA.δ):
     def reachables(self, q0):
         """
         return a list of all reachable qi states from the state q0
+
+        the search follows the stored transitions of each state in
+        the order of Σ, missing ones are not looked up at all
         """
 
+        order = {a: i for i, a in enumerate(self.Σ)}
+        edges = {}
+        for (q, a), target in self.items():
+            if a in order:
+                edges.setdefault(q, []).append((order[a], target))
+
         result = Set()
-        stack = [q0]
+        stack = deque([q0])
 
         while len(stack) > 0:
-            q = stack.pop(0)
+            q = stack.popleft()
             result.add(q)
-            for a in self.Σ:
-                target = self.__getitem__((q, a))
-                if target is not None:
-                    if target not in result:
-                        stack.append(target)
-                    result.add(target)
+            for _, target in sorted(edges.get(q, ())):
+                if target not in result:
+                    stack.append(target)
+                result.add(target)
 
         return result
 
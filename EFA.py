@@ -1,7 +1,8 @@
 import sys
 import types
 
-from utils import Set
+from utils import Set, bits
+from Compiled import CompiledEFA
 import FA
 from NFA import NFA
 
@@ -69,32 +70,41 @@ class EFA(NFA):
         """
         convert EFA to DFA
             remove ε steps
+
+        the states met only in δ (as the inner states of RE.toEFA)
+        are kept as states of the NFA
         """
         import NFA
 
+        states, index, closure = self.δ.closures()
+
+        def targets(q, a):
+            mask = 0
+            for target in self.δ.get((q, a), ()):
+                mask |= 1 << index[target]
+            return mask
+
         δ = NFA.δ()
-        for qi in self.Q:
+        for qi in states:
             for a in self.Σ:
                 if a == "ε":
                     continue
 
-                step1 = self.δ.get((qi, a), Set())
+                step = 0
+                for s in bits(closure[index[qi]]):
+                    step |= targets(states[s], a)
 
-                step2 = Set()
-                for s in self.δ.Dε(qi):
-                    step2 |= self.δ.get((s, a), Set())
+                result = 0
+                for s in bits(step):
+                    result |= closure[s]
 
-                step3 = Set()
-                for s in step1 | step2:
-                    step3 |= self.δ.Dε(s)
-
-                δ[qi, a] = tuple(step3)
+                δ[qi, a] = tuple(states[s] for s in bits(result))
 
         Σ = self.Σ - Set("ε")
         F = (self.F if self.δ.Dε(self.q0).intercept(self.F) == Set() else
              self.F.union(Set(self.q0)))
 
-        return NFA(self.Q, Σ, δ, self.q0, F)
+        return NFA(Set(list(states)), Σ, δ, self.q0, F)
 
     def toDFA(self):
         """
@@ -103,8 +113,13 @@ class EFA(NFA):
         """
         return self.toNFA().toDFA()
 
-    def test(self, word):
-        return self.toDFA().test(word)
+    def compile(self):
+        """
+        return an immutable CompiledEFA which steps on a symbol and
+        then applies the cached ε-closures, it is built once and
+        reused until the automata changes
+        """
+        return self.cached("compiled", lambda: CompiledEFA.from_efa(self))
 
 
 class δ(FA.δ):
@@ -120,22 +135,98 @@ class δ(FA.δ):
             for k, v in zip(key[1:], val):
                 self.__setitem__((key[0], k), v)
 
-    def __getitem__(self, key):
-        key = tuple(map(str, key))
-        return super().__getitem__(key)
+    def closures(self):
+        """
+        ε-closure of every state, computed once and cached
+        on the automata until δ changes, in place changes of
+        the target sets (δ[q, "ε"].add(p)) included
+
+        the ε-graph is condensed into strongly connected components
+        (Tarjan), components come out with their successors already
+        done, so each closure is its own states or-ed with the
+        closures of the components it points to
+
+        return (states, index, closure) where closure[index[q]]
+        is the bitmask of Dε(q) over the numbering states, which are
+        the states of Q followed by any other state met in δ
+        """
+
+        if self.fa is not None:
+            return self.fa.cached("closures", self._closures)
+        return self._closures()
+
+    def _closures(self):
+        # Q first, then the states only met in δ (such as the inner states of RE)
+        index = {q: i for i, q in enumerate(self.fa.Q if self.fa else ())}
+        for (q, a), targets in self.items():
+            index.setdefault(q, len(index))
+            for t in targets:
+                index.setdefault(t, len(index))
+        edges = [(index[q], index[t])
+                 for (q, a), targets in self.items() if a == "ε"
+                 for t in targets]
+        n = len(index)
+
+        succ = [[] for _ in range(n)]
+        for q, t in edges:
+            succ[q].append(t)
+
+        order, low = [-1] * n, [0] * n
+        component = [-1] * n
+        component_closure = []
+        stack, counter = [], 0
+
+        for root in range(n):
+            if order[root] >= 0:
+                continue
+
+            work = [(root, 0)]
+            while work:
+                v, i = work[-1]
+                if i == 0:
+                    order[v] = low[v] = counter
+                    counter += 1
+                    stack.append(v)
+
+                if i < len(succ[v]):
+                    work[-1] = (v, i + 1)
+                    w = succ[v][i]
+                    if order[w] < 0:
+                        work.append((w, 0))
+                    elif component[w] < 0:
+                        low[v] = min(low[v], order[w])
+                    continue
+
+                work.pop()
+                if work:
+                    u = work[-1][0]
+                    low[u] = min(low[u], low[v])
+
+                if low[v] == order[v]:
+                    c = len(component_closure)
+                    members, mask = [], 0
+                    while True:
+                        w = stack.pop()
+                        component[w] = c
+                        members.append(w)
+                        mask |= 1 << w
+                        if w == v:
+                            break
+                    for w in members:
+                        for t in succ[w]:
+                            if component[t] != c:
+                                mask |= component_closure[component[t]]
+                    component_closure.append(mask)
+
+        closure = [component_closure[component[q]] for q in range(n)]
+        return tuple(index), index, closure
 
     def Dε(self, q0):
-        result = Set()
-        stack = [q0]
-        while len(stack) > 0:
-            q = stack.pop(0)
-            result.add(q)
-            targets = self.__getitem__((q, "ε"))
-            for target in targets:
-                if target not in result:
-                    stack.append(target)
-                result.add(target)
-        return result
+        states, index, closure = self.closures()
+        q0 = str(q0)
+        if q0 not in index:
+            return Set(q0)
+        return Set([states[q] for q in bits(closure[index[q0]])])
 
 
 class ô(δ, FA.ô):
@@ -27,8 +27,10 @@ class FA:
         ), f"condition F ⊆ Q not met, element of {F} not in {Q}"
 
         self.__dict__.update({
-            "Q": Q.map(str), "Σ": Σ.map(str), "δ": δ, "I": I.map(str), "F": F.map(str)})
+            "Q": strings(Q), "Σ": strings(Σ), "δ": δ, "I": strings(I), "F": strings(F)})
 
+        for states in (self.Q, self.Σ, self.I, self.F):
+            states.own(self)
         self.δ.fa = self
 
     def table_header(self, text):
@@ -108,13 +110,50 @@ class FA:
             filename = self.__class__.__name__ if filename is None else filename
             G.render("images/" + filename, view=False)
 
+    def cached(self, name, build):
+        """
+
+        return the structure `name` derived from the automata,
+        building it with build() on first use
+
+        the cache is dropped whenever the automata or its δ changes,
+        including in place changes of Q, Σ, I, F and of the target
+        sets of δ (δ[q, a].add(p)), which tell their owner
+
+        """
+
+        cache = self.__dict__.setdefault("_cache", {})
+        if name not in cache:
+            cache[name] = build()
+        return cache[name]
+
+    def invalidate(self):
+        self.__dict__.pop("_cache", None)
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if isinstance(value, Set):
+            value.own(self)
+        self.invalidate()
+
     def __str__(self):
         return (f"A = ({self.Q}, {self.Σ}, δ, {self.I}, {self.F}) where\n" +
                 f"δ = {self.δ}")
 
     def __repr__(self):
         _name = self.__class__.__name__
-        return f"{_name}({', '.join(str(key)+'='+str(val) for key,val in self.__dict__.items())})"
+        return f"{_name}({', '.join(str(key)+'='+str(val) for key,val in self.__dict__.items() if not key.startswith('_'))})"
+
+
+def strings(states):
+    """
+    the states as strings, a set which already holds only strings
+    is left untouched so that it can be shared between automata
+    """
+
+    if all(isinstance(q, str) for q in states):
+        return states
+    return states.map(str)
 
 
 class δ(dict):
@@ -127,35 +166,70 @@ class δ(dict):
     δ[q1, a, b, c] = (q2, q3, q4)
     δ[q1, a, b, c] = ({}, {q2, q3}, {q4})
 
+    a missing transition is read as an empty Set which is not
+    stored, so lookups never change δ, add to a transition with
+    δ.setdefault((q1, a)).add(q2)
+
     """
 
-    def __init__(self, *args, automata=None, **kwargs):
+    def __init__(self, *args, automata=None, Q=None, Σ=None, **kwargs):
         self.fa = automata
+        self.Q = Q
+        self.Σ = Σ
 
         super().__init__(*args, **kwargs)
 
     def __setitem__(self, key, val):
         q, a = map(str, key)
-        super().__setitem__((q, a), val.map(str))
+        super().__setitem__((q, a), val.map(str).own(self))
+        self.invalidate()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.invalidate()
+
+    def copy(self):
+        """
+        a new δ of the same kind holding the same target sets
+        """
+        result = type(self)()
+        dict.update(result, dict.items(self))
+        return result
+
+    def invalidate(self):
+        if self.fa is not None:
+            self.fa.invalidate()
+
+    def key(self, key):
+        """
+        the key under which the transition is stored
+        """
+        return tuple(map(str, key))
 
     def __getitem__(self, key):
+        return self.get(self.key(key), Set())
+
+    def setdefault(self, key, default=None):
+        """
+        return the stored targets of the transition,
+        storing default (an empty Set) if it is missing
+        """
+
+        key = self.key(key)
         if key not in self:
-            self.__setitem__(key, Set())
+            self[key] = Set() if default is None else default
         return super().__getitem__(key)
 
     def prepare(self, Q, Σ):
         """
 
-        set each transition (q, a) to "-"
+        bind δ to the states and the alphabet, a missing
+        transition (q, a) is read as "-" without being stored
 
         """
 
         self.Q = Q
         self.Σ = Σ
-        for qi in Q:
-            for a in Σ:
-                if super().get((qi, a)) is None:
-                    super().__setitem__((qi, a), "-")
 
     def group(self):
         """
@@ -60,11 +60,11 @@ class G:
             for rule in self.P[A]:
                 if len(rule) == 2:
                     a, B = rule
-                    δ[f"{A}̄", a].add(f"{B}̄")
+                    δ.setdefault((f"{A}̄", a)).add(f"{B}̄")
 
                 elif len(rule) == 1 and rule != "ε":
                     a = rule
-                    δ[f"{A}̄", a].add("qf")
+                    δ.setdefault((f"{A}̄", a)).add("qf")
 
         return M
 
@@ -1,7 +1,10 @@
 import sys
 import types
 
+from dataclasses import replace
+
 from utils import Set
+from Compiled import CompiledNFA, LazyDFA
 import FA
 
 
@@ -76,41 +79,76 @@ class NFA(FA.FA):
 
         super().table_body(print_content)
 
-    def toDFA(self):
+    def compile(self):
+        """
+        return an immutable CompiledNFA with integer states and bitmask
+        state sets, it is built once and reused until the automata changes
+        """
+        return self.cached("compiled", lambda: CompiledNFA.from_nfa(self))
+
+    def toDFA(self, names=True):
         """
         convert NFA to DFA
+
+        subset construction over bitmasks of NFA states, the
+        macro-states are named [q1q2...] only when names is set,
+        otherwise they are numbered in the order of discovery
+
+        should two macro-states get the same name ({1, 2} and {12}),
+        the names of all of them are written [q1,q2,...]
         """
-        import DFA
 
         def rename_state(state):
             import re
             return re.sub(r"[\{\}\,\sØ]", r"", f"[{state}]")
 
-        q0 = rename_state(Set(self.q0))
-        Q = Set(Set(self.q0))
-        δ = DFA.δ()
-        F = Set()
-        Done = Set()
-
-        while (Q - Done) != Set():
-            M = (Q - Done).pop(0)
-            if M.intercept(self.F) != Set():
-                F = F.union(Set(M))
-            for a in self.Σ:
-                N = Set.Union([self.δ[p, a] for p in M])
-                Q = Q.union(Set(N))
-                δ[rename_state(M), a] = rename_state(N)
-            Done = Done.union(Set(M))
-
-        Q = Set([rename_state(qi) for qi in Q])
-        δ = DFA.δ({(qi, a): Set(target)
-                   for (qi, a), target in δ.items()})
-        F = Set([rename_state(qf) for qf in F])
-
-        return DFA(Q, self.Σ, δ, q0, F)
+        nfa = self.compile()
+        masks, dfa = nfa.determinize()
+        if names:
+            states = tuple(rename_state(Set(nfa.names(M))) for M in masks)
+            if len(set(states)) < len(states):
+                states = tuple(f"[{','.join(nfa.names(M))}]" for M in masks)
+            dfa = replace(dfa, states=states)
+        return dfa.toDFA()
+
+    def lazy(self, max_states=10000):
+        """
+        return a LazyDFA which determinizes the automata only
+        as far as the tested words need it, keeping at most
+        max_states DFA states at a time
+        """
+        return LazyDFA(self.compile(), max_states)
 
     def test(self, word):
-        return self.toDFA().test(word)
+        return self.compile().test(word)
+
+    def includes(self, other, witness=False):
+        """
+        tell whether L(other) ⊆ L(self) for an NFA (or EFA) other by
+        an antichain search, with witness=True return (result, word)
+        where word is a shortest word of other rejected by self (or
+        None), see CompiledNFA.includes
+        """
+        return self.compile().includes(other.compile(), witness)
+
+    def is_universal(self, witness=False):
+        """
+        tell whether the automata accepts every word over Σ, with
+        witness=True return (result, word) for a shortest rejected word
+        """
+        return self.compile().is_universal(witness)
+
+    def test_many(self, words, max_states=10000):
+        """
+        test many words against the same compiled tables, the
+        transitions met on the way are kept in a LazyDFA shared
+        by all of the words
+
+        return a list of bools, unlike DFA.test_many which returns
+        a NumPy array as it runs the words over a dense table
+        """
+        lazy = self.lazy(max_states)
+        return [lazy.test(word) for word in words]
 
 
 class δ(FA.δ):
@@ -126,11 +164,6 @@ class δ(FA.δ):
             for k, v in zip(key[1:], val):
                 self.__setitem__((key[0], k), v)
 
-    def __getitem__(self, key):
-        if key not in self:
-            self.__setitem__(key, Set())
-        return super().__getitem__(key)
-
 
 class ô(FA.ô):
     """
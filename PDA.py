@@ -40,23 +40,37 @@ class PDA:
 
 
 class δ(dict):
+    """
+    a missing transition is read as an empty Set which is not
+    stored, add to a transition with δ.setdefault((q, a, X)).add(...)
+    """
+
+    def key(self, key):
+        return tuple(map(str, key))
+
     def __setitem__(self, key, val):
-        super().__setitem__(tuple(map(str, key)), Set(map(str, val)))
+        super().__setitem__(self.key(key), Set(map(str, val)))
 
     def __getitem__(self, key):
+        return self.get(self.key(key), Set())
+
+    def setdefault(self, key, default=None):
+        key = self.key(key)
         if key not in self:
-            self.__setitem__(key, Set())
+            self[key] = Set() if default is None else default
         return super().__getitem__(key)
 
 
-class ô(dict):
-    def __setitem__(self, key, val):
-        super().__setitem__(key, val)
+class ô(δ):
+    """
+    inherited from δ, the keys and targets are stored as they are
+    """
 
-    def __getitem__(self, key):
-        if key not in self:
-            self.__setitem__(key, Set())
-        return super().__getitem__(key)
+    def key(self, key):
+        return key
+
+    def __setitem__(self, key, val):
+        dict.__setitem__(self, key, val)
 
 
 class call(types.ModuleType):
@@ -77,12 +77,14 @@ class RE(FA.FA):
             δ["START", "ε"] = qs
 
         for qf in self.F:
-            δ[qf, "ε"].add("END")
+            δ.setdefault((qf, "ε")).add("END")
 
         for (qfrom, a), qto in self.δ.items():
             tokens = parseRegex(a)
             ast = toAST(tokens)
             for qi in qto:
+                if type(ast) in (Epsilon, Literal):
+                    efa.δ.setdefault((qfrom, ast)).add(qi)
                 ast.eval(efa, qfrom, qi)
 
         return efa
@@ -92,6 +94,18 @@ class δ(FA.δ):
     pass
 
 
+def fresh(efa, state):
+    """
+    prime the state until it is a new state of the efa, so that
+    equal subexpressions do not share their inner states
+    """
+    used = efa.__dict__.setdefault("_used", set(efa.Q) | {q for q, a in efa.δ})
+    while state in used:
+        state += "'"
+    used.add(state)
+    return state
+
+
 @dataclass
 class Epsilon:
     pass
@@ -121,9 +135,9 @@ class Or:
 
     def eval(self, efa, qfrom, qto):
         if type(self.left) in (Epsilon, Literal):
-            efa.δ[qfrom, self.left].add(qto)
+            efa.δ.setdefault((qfrom, self.left)).add(qto)
         if type(self.right) in (Epsilon, Literal):
-            efa.δ[qfrom, self.right].add(qto)
+            efa.δ.setdefault((qfrom, self.right)).add(qto)
 
         self.left.eval(efa, qfrom, qto)
         self.right.eval(efa, qfrom, qto)
@@ -138,12 +152,12 @@ class Then:
     right: None
 
     def eval(self, efa, qfrom, qto):
-        s = f"({qfrom}.{qto})"
+        s = fresh(efa, f"({qfrom}.{qto})")
 
         if type(self.left) in (Epsilon, Literal):
-            efa.δ[qfrom, self.left].add(s)
+            efa.δ.setdefault((qfrom, self.left)).add(s)
         if type(self.right) in (Epsilon, Literal):
-            efa.δ[s, self.right].add(qto)
+            efa.δ.setdefault((s, self.right)).add(qto)
 
         self.left.eval(efa, qfrom, s)
         self.right.eval(efa, s, qto)
@@ -157,12 +171,12 @@ class Star:
     left: None
 
     def eval(self, efa, qfrom, qto):
-        s = f"ε.({self.left})*.ε"
+        s = fresh(efa, f"ε.({self.left})*.ε")
 
-        efa.δ[qfrom, "ε"].add(s)
+        efa.δ.setdefault((qfrom, "ε")).add(s)
         if type(self.left) in (Epsilon, Literal):
-            efa.δ[s, self.left].add(s)
-        efa.δ[s, "ε"].add(qto)
+            efa.δ.setdefault((s, self.left)).add(s)
+        efa.δ.setdefault((s, "ε")).add(qto)
 
         self.left.eval(efa, s, s)
 
@@ -0,0 +1,426 @@
+import sys
+import types
+from array import array
+from bisect import bisect_right
+from collections import deque
+
+from utils import Set, parseRegex
+from Compiled import CompiledDFA, CompiledSFA
+import FA
+
+
+MAX = 0x10FFFF
+
+
+class SFA(FA.FA):
+    """
+    Symbolic finite automata
+
+    the edges are labelled by sets of code points kept as sorted
+    tuples of disjoint intervals ((lo, hi), ...) instead of one
+    edge per symbol, so the automata grows with the number of
+    ranges and not with the size of the alphabet
+
+        δ[q, "[a-z]"] = Set(p)
+        δ[q, ((97, 122),)] = Set(p)
+        δ[q, "ε"] = Set(p)
+
+    """
+
+    def __init__(self, Q, δ, q0, F):
+        """
+
+        Q  : set of states
+        δ  : Q × intervals → 2^Q transition function
+        q0 : q0 ∈ Q initial state
+        F  : F ⊆ Q set of accepting states
+
+        """
+
+        super().__init__(Q, Set(), δ, Set(q0), F)
+        self.q0 = str(q0)
+
+    @staticmethod
+    def fromRegex(pattern):
+        """
+        Thompson construction of the pattern in the syntax of RE
+        (a.b, a+b, (a)*) with the character classes [a-z] and [^a-z]
+        """
+        import SFA
+
+        δ = SFA.δ()
+        Q = Set()
+
+        def new():
+            q = str(len(Q))
+            Q.add(q)
+            return q
+
+        stack = []
+        for token in parseRegex(pattern, classes=True):
+            if token.name in ("CHAR", "CLASS"):
+                p, q = new(), new()
+                δ[p, token.value] = Set(q)
+                stack.append((p, q))
+
+            elif token.name == "ALT":
+                (p2, q2), (p1, q1) = stack.pop(), stack.pop()
+                p, q = new(), new()
+                δ[p, "ε"] = Set(p1, p2)
+                δ[q1, "ε"] = Set(q)
+                δ[q2, "ε"] = Set(q)
+                stack.append((p, q))
+
+            elif token.name == "CONCAT":
+                (p2, q2), (p1, q1) = stack.pop(), stack.pop()
+                δ[q1, "ε"] = Set(p2)
+                stack.append((p1, q2))
+
+            elif token.name == "STAR":
+                p1, q1 = stack.pop()
+                p, q = new(), new()
+                δ[p, "ε"] = Set(p1, q)
+                δ[q1, "ε"] = Set(p1, q)
+                stack.append((p, q))
+
+            else:
+                raise NotImplementedError(f"Regex unknown token {token}")
+
+        if len(stack) != 1:
+            raise NotImplementedError(
+                f"Stack must be of length 1, is {len(stack)}")
+
+        start, end = stack[0]
+        return SFA(Q, δ, start, Set(end))
+
+    def edges(self):
+        """
+        group the edges by their source state
+        return ({q: [(label, targets)]}, {q: ε targets})
+        """
+
+        out, ε = {}, {}
+        for (q, label), targets in self.δ.items():
+            if label == "ε":
+                ε.setdefault(q, []).extend(targets)
+            elif targets:
+                out.setdefault(q, []).append((label, targets))
+        return out, ε
+
+    def toDFA(self):
+        """
+        subset construction over interval partitions
+
+        the labels leaving a set of states are cut into disjoint
+        intervals, every interval goes to the ε-closed set of the
+        targets of the labels covering it and the intervals going
+        to the same set are merged into one label
+        """
+        import SFA
+
+        out, ε = self.edges()
+
+        def closure(states):
+            result, stack = set(states), list(states)
+            while stack:
+                for t in ε.get(stack.pop(), ()):
+                    if t not in result:
+                        result.add(t)
+                        stack.append(t)
+            return frozenset(result)
+
+        start = closure([self.q0])
+        ids = {start: 0}
+        work = deque([start])
+        δ = SFA.δ()
+
+        while work:
+            S = work.popleft()
+            edges = [(label, t) for q in sorted(S) for label, targets in out.get(q, ())
+                     for t in targets]
+
+            groups = {}
+            for lo, hi, targets in split(edges):
+                T = closure(targets)
+                groups.setdefault(T, []).append((lo, hi))
+
+            for T, intervals in groups.items():
+                if T not in ids:
+                    ids[T] = len(ids)
+                    work.append(T)
+                δ[ids[S], tuple(intervals)] = Set(ids[T])
+
+        F = Set(i for S, i in ids.items() if any(q in self.F for q in S))
+        return SFA(Set(range(len(ids))), δ, 0, F)
+
+    def compile(self):
+        """
+        return a CompiledSFA of the determinized automata,
+        it is built once and reused until the automata changes
+        """
+        return self.cached("compiled", lambda: CompiledSFA.from_sfa(self.toDFA()))
+
+    def test(self, word):
+        return self.compile().test(word)
+
+    def product(self, other, accept):
+        """
+        create a new deterministic SFA over the pairs of states
+        reachable from (q1, q2), the labels of both are cut into
+        disjoint intervals and a side without an edge on an interval
+        goes to the dead state None, as in DFA.product
+        """
+        import SFA
+
+        A, B = self.toDFA(), other.toDFA()
+        (outA, _), (outB, _) = A.edges(), B.edges()
+
+        alive_without_p = accept(False, True) or accept(False, False)
+        alive_without_q = accept(True, False) or accept(False, False)
+
+        start = (A.q0, B.q0)
+        ids = {start: 0}
+        work = deque([start])
+        δ = SFA.δ()
+
+        while work:
+            p, q = work.popleft()
+            edges = ([(label, (0, targets[0])) for label, targets in outA.get(p, ())] +
+                     [(label, (1, targets[0])) for label, targets in outB.get(q, ())])
+
+            groups = {}
+            for lo, hi, targets in split(edges):
+                sides = dict(targets)
+                p2, q2 = sides.get(0), sides.get(1)
+                if (p2 is None and (q2 is None or not alive_without_p) or
+                        q2 is None and not alive_without_q):
+                    continue
+                groups.setdefault((p2, q2), []).append((lo, hi))
+
+            for pair, intervals in groups.items():
+                if pair not in ids:
+                    ids[pair] = len(ids)
+                    work.append(pair)
+                δ[ids[p, q], tuple(intervals)] = Set(ids[pair])
+
+        F = Set(i for (p, q), i in ids.items() if accept(p in A.F, q in B.F))
+        M = SFA(Set(range(len(ids))), δ, 0, F)
+        M.pairs = {str(i): pair for pair, i in ids.items()}
+        return M
+
+    def intersept(self, other):
+        return self.product(other, lambda p, q: p and q)
+
+    def __and__(self, other):
+        return self.intersept(other)
+
+    def union(self, other):
+        return self.product(other, lambda p, q: p or q)
+
+    def __or__(self, other):
+        return self.union(other)
+
+    def minimize(self):
+        """
+        the labels of all of the states are cut into the coarsest
+        disjoint intervals, they are the symbols of a CompiledDFA
+        (whose classes merge the ones that behave alike), it is
+        refined by Hopcroft and turned back into intervals
+
+        dead states are dropped, the result is a partial DFA
+        """
+        import SFA
+
+        D = self.toDFA()
+        out, _ = D.edges()
+        states = {q: i for i, q in enumerate(D.Q)}
+
+        labels = [label for edges in out.values() for label, _ in edges]
+        intervals = [(lo, hi) for lo, hi, _ in split([(label, None) for label in labels])]
+        lows = [lo for lo, _ in intervals]
+
+        n, m = len(states), len(intervals)
+        table = [-1] * (n * m)
+        for q, edges in out.items():
+            for label, targets in edges:
+                for lo, hi in label:
+                    for a in range(bisect_right(lows, lo) - 1, bisect_right(lows, hi)):
+                        table[states[q] * m + a] = states[targets[0]]
+
+        accepting = bytes(1 if q in D.F else 0 for q in states)
+        compiled = CompiledDFA.from_table(tuple(states), tuple(intervals),
+                                          array('i', table), accepting, states[D.q0])
+
+        # drop the transitions into states which can no longer accept
+        live = compiled.live
+        table = array('i', (t if t >= 0 and live[t] else -1 for t in compiled.table))
+        compiled = CompiledDFA(compiled.states, compiled.symbols, table,
+                               compiled.accepting, compiled.start, compiled.classes)
+        minimal = compiled.quotient(compiled.partition())
+
+        # number the reachable blocks in the order of discovery
+        w = minimal.width
+        ids = {minimal.start: 0}
+        work = deque([minimal.start])
+        δ = SFA.δ()
+        while work:
+            b = work.popleft()
+            groups = {}
+            for (lo, hi), c in zip(minimal.symbols, minimal.classes):
+                t = minimal.table[b * w + c]
+                if t >= 0:
+                    groups.setdefault(t, []).append((lo, hi))
+            for t, intervals in groups.items():
+                if t not in ids:
+                    ids[t] = len(ids)
+                    work.append(t)
+                δ[ids[b], tuple(intervals)] = Set(ids[t])
+
+        F = Set(i for b, i in ids.items() if minimal.accepting[b])
+        return SFA(Set(range(len(ids))), δ, 0, F)
+
+    def table(self):
+        super().table_header("SYMBOLIC FINITE AUTOMATA")
+
+        def print_content():
+            for (q, label), targets in self.δ.items():
+                print(f"δ({q}, {show(label)}) = {targets}")
+
+        super().table_body(print_content)
+
+
+class δ(FA.δ):
+    """
+    inherited from FA.δ, look there for more information
+
+    a label is "ε", a character, a class "[a-z]" or intervals
+    """
+
+    def key(self, key):
+        q, label = key
+        return str(q), intervals(label)
+
+    def __setitem__(self, key, val):
+        dict.__setitem__(self, self.key(key), Set(map(str, val)).own(self))
+        self.invalidate()
+
+
+def intervals(label):
+    """
+    the sorted disjoint intervals of a label, "ε" stays as it is
+    """
+
+    if label == "ε":
+        return label
+    if isinstance(label, str):
+        return ranges(label)
+    return normalize(label)
+
+
+def ranges(spec):
+    """
+    code point intervals of a single character or
+    a character class [a-z0-9_] or its complement [^a-z]
+    """
+
+    if not (len(spec) > 2 and spec[0] == "[" and spec[-1] == "]"):
+        return ((ord(spec), ord(spec)),)
+
+    body = spec[1:-1]
+    negate = body.startswith("^") and len(body) > 1
+    if negate:
+        body = body[1:]
+
+    result, i = [], 0
+    while i < len(body):
+        if i + 2 < len(body) and body[i + 1] == "-":
+            result.append((ord(body[i]), ord(body[i + 2])))
+            i += 3
+        else:
+            result.append((ord(body[i]), ord(body[i])))
+            i += 1
+
+    result = normalize(result)
+    return complement(result) if negate else result
+
+
+def normalize(intervals):
+    merged = []
+    for lo, hi in sorted(intervals):
+        if merged and lo <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+        else:
+            merged.append((lo, hi))
+    return tuple(merged)
+
+
+def complement(intervals):
+    result, lo = [], 0
+    for a, b in intervals:
+        if a > lo:
+            result.append((lo, a - 1))
+        lo = b + 1
+    if lo <= MAX:
+        result.append((lo, MAX))
+    return tuple(result)
+
+
+def split(edges):
+    """
+    cut the labels of the edges [(label, target)] into disjoint
+    intervals by a sweep over their ends, yield (lo, hi, targets)
+    for every interval covered by some label, targets being those
+    of all of the labels covering it
+    """
+
+    events = []
+    for k, (label, _) in enumerate(edges):
+        for lo, hi in label:
+            events.append((lo, k))
+            events.append((hi + 1, ~k))
+    events.sort()
+
+    active = {}
+    i = 0
+    while i < len(events):
+        point = events[i][0]
+        while i < len(events) and events[i][0] == point:
+            k = events[i][1]
+            if k >= 0:
+                active[k] = edges[k][1]
+            else:
+                del active[~k]
+            i += 1
+        if active and i < len(events):
+            yield point, events[i][0] - 1, [active[k] for k in sorted(active)]
+
+
+def show(label):
+    if label == "ε":
+        return label
+    return "[" + "".join(chr(lo) if lo == hi else f"{chr(lo)}-{chr(hi)}"
+                         for lo, hi in label) + "]"
+
+
+# SFA.fromRegex(pattern) straight from the module
+fromRegex = SFA.fromRegex
+
+
+class call(types.ModuleType):
+    """
+    make the module callable simplifying
+    from SFA import SFA
+    to
+    import SFA
+    """
+
+    def __init__(self):
+        types.ModuleType.__init__(self, __name__)
+        # or super().__init__(__name__) for Python 3
+        self.__dict__.update(sys.modules[__name__].__dict__)
+
+    def __call__(self, *args, **kwargs):
+        return SFA(*args, **kwargs)
+
+
+sys.modules[__name__] = call()
@@ -0,0 +1,117 @@
+from itertools import chain
+
+from utils import Set, parseRegex
+
+
+class Tokenizer:
+    """
+    Maximal munch tokenizer
+
+    built from an ordered list of (name, pattern) rules, patterns are
+    regular expressions as read by RE (a.b, a+b, (a)*), all of the
+    rules are merged into one minimized DFA whose accepting states
+    are tagged with the first rule they accept
+
+        lexer = Tokenizer([("IF", "i.f"), ("ID", "(i+f)*"), ("WS", " ")])
+        list(lexer.tokenize("if fi"))
+
+    """
+
+    def __init__(self, rules):
+        self.names = tuple(name for name, _ in rules)
+        self.compiled, self.tags = Tokenizer.build(rules)
+
+    @staticmethod
+    def build(rules):
+        """
+        join the EFAs of the rules under a new START state, determinize
+        it tagging every DFA state with the first rule it accepts and
+        minimize it keeping states of different tags apart
+        """
+        import EFA
+        import RE
+
+        Q, Σ, F = Set("START"), Set(), []
+        δ = EFA.δ()
+        δ["START", "ε"] = Set([f"{k}:START" for k in range(len(rules))])
+
+        for k, (name, pattern) in enumerate(rules):
+            re_δ = RE.δ()
+            M = RE(Set(0, 1), Set(), re_δ, Set(0), Set(1))
+            re_δ[0, pattern] = Set(1)
+
+            for (q, a), targets in M.toEFA().δ.items():
+                targets = Set([f"{k}:{t}" for t in targets])
+                δ[f"{k}:{q}", a] = targets
+                Q |= targets + Set(f"{k}:{q}")
+            Σ |= Set(token.value for token in parseRegex(pattern)
+                     if token.name == "CHAR")
+            F.append(f"{k}:END")
+
+        efa = EFA(Q | Set(F), Σ, δ, "START", Set(F))
+        nfa = efa.compile()
+        index = {q: i for i, q in enumerate(nfa.states)}
+        finals = [1 << index[qf] for qf in F]
+
+        masks, dfa = nfa.determinize()
+        tags = [next((k for k, qf in enumerate(finals) if M & qf), -1)
+                for M in masks]
+
+        block = dfa.partition(tags)
+        minimal = dfa.quotient(block)
+        minimal_tags = [-1] * len(minimal.states)
+        for q, b in enumerate(block):
+            minimal_tags[b] = tags[q]
+        return minimal, minimal_tags
+
+    def stream(self, chunks):
+        """
+        yield the (name, lexeme, offset) tokens of text coming in chunks
+
+        the state of the DFA and the last accepting position are kept
+        across chunks, so a token split among chunks is read only once,
+        after a token the text past its end is read again from the start
+
+        positions are indices into buffer, a token is sliced out of it
+        and the text of the yielded tokens is dropped only when the next
+        chunk is appended, so one long text is never copied
+        """
+
+        dfa = self.compiled
+        table, symbols, m = dfa.table, dfa.symbol_index, dfa.width
+        tags, live = self.tags, dfa.live
+
+        # buffer[start:j] of the token being read has been read,
+        # base is the offset of buffer[0] in the whole text
+        buffer, base, start = "", 0, 0
+        q, j, end, tag = dfa.start, 0, 0, -1
+
+        for chunk in chain(chunks, [None]):
+            final = chunk is None
+            if not final:
+                buffer = buffer[start:] + chunk
+                base, j, end, start = base + start, j - start, end - start, 0
+
+            while start < len(buffer):
+                stuck = False
+                while j < len(buffer):
+                    a = symbols.get(buffer[j])
+                    q = table[q * m + a] if a is not None else -1
+                    if q < 0 or not live[q]:
+                        stuck = True
+                        break
+                    j += 1
+                    if tags[q] >= 0:
+                        end, tag = j, tags[q]
+
+                if not stuck and not final:
+                    break  # the token may go on in the next chunk
+                if tag < 0:
+                    raise ValueError(f"no token matches at offset {base + start}")
+
+                yield self.names[tag], buffer[start:end], base + start
+                start = j = end
+                q, tag = dfa.start, -1
+
+    def tokenize(self, text):
+        return self.stream([text])
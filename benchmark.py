@@ -0,0 +1,422 @@
+from random import Random
+from time import perf_counter
+
+from utils import Set
+
+
+def timed(func, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = perf_counter()
+        func()
+        best = min(best, perf_counter() - start)
+    return best
+
+
+def report(name, old, new):
+    print(f"{name:<24} {old * 1000:>10.2f} ms {new * 1000:>10.2f} ms"
+          f" {old / new:>8.1f}x")
+
+
+class ListSet:
+    """
+    the former list backed Set, kept only as a baseline
+    """
+
+    def __init__(self, values=()):
+        seen = set()
+        self.values = [x for x in values if not (x in seen or seen.add(x))]
+
+    def union(self, other):
+        seen = set()
+        return ListSet([x for x in self.values + other.values
+                        if not (x in seen or seen.add(x))])
+
+    def add(self, item):
+        self.values = self.union(ListSet([item])).values
+
+    def intercept(self, other):
+        return ListSet([x for x in self.values + other.values
+                        if x in other.values and x in self.values])
+
+    def difference(self, other):
+        return ListSet([x for x in self.values if x not in other.values])
+
+    def __contains__(self, item):
+        return item in self.values
+
+
+def bench_set(n=10_000):
+    print(f"--- Set, {n} elements " + "-" * 40)
+    print(f"{'operation':<24} {'list':>13} {'dict':>13} {'speedup':>9}")
+
+    left, right = range(n), range(n // 2, n + n // 2)
+    old1, old2 = ListSet(left), ListSet(right)
+    new1, new2 = Set(left), Set(right)
+
+    def old_add():
+        s = ListSet()
+        for x in left:
+            s.add(x)
+
+    def new_add():
+        s = Set()
+        for x in left:
+            s.add(x)
+
+    report("add", timed(old_add, 1), timed(new_add))
+    report("membership", timed(lambda: [x in old1 for x in right], 1),
+           timed(lambda: [x in new1 for x in right]))
+    report("union", timed(lambda: old1.union(old2)),
+           timed(lambda: new1.union(new2)))
+    report("intercept", timed(lambda: old1.intercept(old2), 1),
+           timed(lambda: new1.intercept(new2)))
+    report("difference", timed(lambda: old1.difference(old2), 1),
+           timed(lambda: new1.difference(new2)))
+
+
+def bench_tokenizer(n=20_000):
+    from Tokenizer import Tokenizer
+
+    letters, digits = "abcdefghijklmnopqrstuvwxyz", "0123456789"
+    keywords = ["if", "else", "while", "for", "return", "def", "class",
+                "import", "from", "as", "with", "try", "except", "raise",
+                "pass", "break", "continue", "lambda", "yield", "global"]
+    rules = [(word.upper(), ".".join(word)) for word in keywords]
+    rules += [("ID", f"({'+'.join(letters)}).({'+'.join(letters + digits)})*"),
+              ("NUM", f"({'+'.join(digits)}).({'+'.join(digits)})*"),
+              ("WS", " . *"), ("EQ", "="), ("SEMI", ";")]
+
+    rng = Random(0)
+    words = keywords + ["x", "value", "i2", "42", "=", ";"]
+    text = " ".join(rng.choice(words) for _ in range(n))
+
+    print(f"--- Tokenizer, {len(rules)} rules, {len(text)} chars " + "-" * 20)
+
+    start = perf_counter()
+    lexer = Tokenizer(rules)
+    print(f"build {(perf_counter() - start) * 1000:.2f} ms,"
+          f" {len(lexer.compiled)} states")
+
+    # one minimized DFA per rule, tried in turn at every position
+    singles = [(name, Tokenizer([(name, pattern)]).compiled)
+               for name, pattern in rules]
+
+    def one_by_one():
+        tokens, i = [], 0
+        while i < len(text):
+            best, end = None, i
+            for name, dfa in singles:
+                table, m, q = dfa.table, dfa.width, dfa.start
+                for j in range(i, len(text)):
+                    a = dfa.symbol_index.get(text[j])
+                    q = table[q * m + a] if a is not None else -1
+                    if q < 0:
+                        break
+                    if dfa.accepting[q] and j + 1 > end:
+                        best, end = name, j + 1
+            if best is None:
+                raise ValueError(f"no token matches at offset {i}")
+            tokens.append((best, text[i:end], i))
+            i = end
+        return tokens
+
+    def merged():
+        return list(lexer.tokenize(text))
+
+    assert one_by_one() == merged()
+    count = len(merged())
+    old, new = timed(one_by_one, 1), timed(merged)
+    print(f"{'one rule at a time':<24} {count / old:>12.0f} tokens/s")
+    print(f"{'merged DFA':<24} {count / new:>12.0f} tokens/s {old / new:>8.1f}x")
+
+
+def bench_to_python(n=20_000):
+    import DFA
+
+    δ = DFA.δ()
+    A = DFA(Set(1, 2, 3, 4, 5, 6, 7), Set("a", "b"), δ, 1, Set(3, 5, 6))
+    δ[1, "a"] = 2
+    δ[2, "a"] = 3; δ[2, "b"] = 4
+    δ[3, "a"] = 6; δ[3, "b"] = 5
+    δ[4, "a"] = 3; δ[4, "b"] = 2
+    δ[5, "a"] = 6; δ[5, "b"] = 3
+    δ[6, "a"] = 2
+    δ[7, "a"] = 6; δ[7, "b"] = 1
+
+    rng = Random(0)
+    words = ["".join(rng.choice("ab") for _ in range(rng.randrange(1, 24)))
+             for _ in range(n)]
+
+    print(f"--- to_python, {n} words " + "-" * 37)
+    start = perf_counter()
+    match = A.to_python()
+    print(f"generate {(perf_counter() - start) * 1000:.2f} ms")
+
+    assert [match(w) for w in words] == [A.test(w) for w in words]
+    print(f"{'operation':<24} {'test':>13} {'generated':>13} {'speedup':>9}")
+    report("match words", timed(lambda: [A.test(w) for w in words]),
+           timed(lambda: [match(w) for w in words]))
+
+
+def bench_bytes(n=1 << 20):
+    import DFA
+
+    # even number of newlines over any bytes
+    δ = DFA.δ()
+    A = DFA(Set("even", "odd"), Set(map(chr, range(256))), δ, "even", Set("even"))
+    for b in map(chr, range(256)):
+        δ["even", b] = "odd" if b == "\n" else "even"
+        δ["odd", b] = "even" if b == "\n" else "odd"
+
+    data = bytes(Random(0).randrange(256) for _ in range(n))
+    compiled, raw = A.compile(), A.compile_bytes()
+
+    print(f"--- ByteDFA, {n} bytes " + "-" * 39)
+    assert compiled.test(data.decode("latin-1")) == raw.test(data) == raw.test(memoryview(data))
+    print(f"{'operation':<24} {'decoded':>13} {'bytes':>13} {'speedup':>9}")
+    report("test", timed(lambda: compiled.test(data.decode("latin-1")), 1),
+           timed(lambda: raw.test(data), 1))
+
+
+def bench_classes(n=200):
+    from array import array
+    from Compiled import CompiledDFA
+    import DFA
+
+    # a ring of n states over 256 symbols, only a handful of which matter
+    δ = DFA.δ()
+    A = DFA(Set(range(n)), Set(range(256)), δ, 0, Set(0))
+    for q in range(n):
+        for b in range(256):
+            δ[q, b] = (q + 1) % n if b in (10, 13) else q if b < 128 else 0
+
+    start = perf_counter()
+    classes = A.compile()
+    build = perf_counter() - start
+
+    m = len(classes.symbols)
+    full = array('i', [-1]) * (n * m)
+    for q in range(n):
+        for a, c in enumerate(classes.classes):
+            full[q * m + a] = classes.table[q * classes.width + c]
+    plain = CompiledDFA(classes.states, classes.symbols, full,
+                        classes.accepting, classes.start)
+
+    print(f"--- classes, {n} states × {m} symbols " + "-" * 25)
+    print(f"build {build * 1000:.2f} ms, {classes.width} classes")
+    print(f"{'table':<24} {len(plain.table) * 4:>10} B  {len(classes.table) * 4:>10} B"
+          f" {len(plain.table) / len(classes.table):>8.1f}x")
+
+    words = [[str(Random(i).randrange(256)) for _ in range(200)] for i in range(500)]
+    assert [plain.test(w) for w in words] == [classes.test(w) for w in words]
+    report("test", timed(lambda: [plain.test(w) for w in words]),
+           timed(lambda: [classes.test(w) for w in words]))
+
+
+def bench_packed(n=20_000):
+    from array import array
+    from Compiled import CompiledDFA
+
+    # trie of random words, most rows have a single transition
+    rng = Random(0)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = ["".join(rng.choice(letters) for _ in range(rng.randrange(3, 12)))
+             for _ in range(n)]
+
+    children, final = [{}], [0]
+    for word in words:
+        q = 0
+        for a in word:
+            if a not in children[q]:
+                children[q][a] = len(children)
+                children.append({})
+                final.append(0)
+            q = children[q][a]
+        final[q] = 1
+
+    m = len(letters)
+    table = array('i', [-1]) * (len(children) * m)
+    for q, row in enumerate(children):
+        for a, t in row.items():
+            table[q * m + letters.index(a)] = t
+    dense = CompiledDFA(tuple(map(str, range(len(children)))), tuple(letters),
+                        table, bytes(final), 0)
+
+    print(f"--- PackedDFA, {len(children)} states × {m} symbols " + "-" * 17)
+    start = perf_counter()
+    packed = dense.pack()
+    print(f"build {(perf_counter() - start) * 1000:.2f} ms")
+
+    print(f"{'table':<24} {len(dense.table) * 4:>10} B  {packed.nbytes:>10} B"
+          f" {len(dense.table) * 4 / packed.nbytes:>8.1f}x")
+    tests = words[:5000] + ["".join(rng.choice(letters) for _ in range(8))
+                            for _ in range(5000)]
+    assert [dense.test(w) for w in tests] == [packed.test(w) for w in tests]
+    print(f"{'operation':<24} {'dense':>13} {'packed':>13} {'speedup':>9}")
+    report("test", timed(lambda: [dense.test(w) for w in tests]),
+           timed(lambda: [packed.test(w) for w in tests]))
+
+
+def bench_partial(n=300, k=1000):
+    import DFA
+
+    # a sparse DFA, every state has three of the k symbols
+    rnd = Random(4)
+    δ = DFA.δ()
+    A = DFA(Set(range(n)), Set(range(k)), δ, 0, Set(range(0, n, 7)))
+    for q in range(n):
+        for a in rnd.sample(range(k), 3):
+            δ[q, a] = rnd.randrange(n)
+
+    print(f"--- minimize, {n} states × {k} symbols, 3 each " + "-" * 15)
+    print(f"{'operation':<24} {'complete':>13} {'partial':>13} {'speedup':>9}")
+    complete, partial = A.minimize(complete=True), A.minimize()
+    assert len(complete.Q) == len(partial.Q) + 1
+    print(f"{'transitions':<24} {len(complete.δ):>13} {len(partial.δ):>13}"
+          f" {len(complete.δ) / len(partial.δ):>8.1f}x")
+    report("minimize", timed(lambda: A.minimize(complete=True), 1),
+           timed(lambda: A.minimize(), 1))
+
+
+def bench_equivalent(n=300):
+    import DFA
+
+    def random_dfa(seed, states=30):
+        rnd = Random(seed)
+        δ = DFA.δ()
+        A = DFA(Set(range(states)), Set("a", "b", "c"), δ, 0,
+                Set(q for q in range(states) if rnd.random() < .3))
+        for q in range(states):
+            for a in "abc":
+                δ[q, a] = rnd.randrange(states)
+        return A
+
+    pairs = [(A, A.minimize(complete=True)) for A in map(random_dfa, range(n))]
+    pairs += [(random_dfa(i), random_dfa(i + n)) for i in range(n)]
+
+    def canonical(A):
+        M = A.minimize(complete=True)
+        return sorted(M.δ.items()), sorted(M.F)
+
+    def old():
+        return [canonical(A) == canonical(B) for A, B in pairs]
+
+    def new():
+        return [A.equivalent(B) for A, B in pairs]
+
+    assert old() == new()
+    print(f"--- equivalence, {len(pairs)} pairs of 30 states " + "-" * 21)
+    print(f"{'operation':<24} {'minimize':>13} {'union-find':>13} {'speedup':>9}")
+    report("equivalent", timed(old, 1), timed(new, 1))
+
+
+def bench_inclusion(n=12):
+    import NFA
+
+    # the n-th letter from the end is an a, 2^n states once determinized
+    def nth_from_end(loop):
+        δ = NFA.δ()
+        A = NFA(Set(range(n + 2)), Set("a", "b"), δ, 0, Set(n + 1))
+        δ[0, "a"] = Set(0, 1) if loop else Set(1)
+        if loop:
+            δ[0, "b"] = Set(0)
+        for q in range(1, n + 1):
+            δ[q, "a"] = Set(q + 1)
+            δ[q, "b"] = Set(q + 1)
+        return A
+
+    A, B = nth_from_end(True), nth_from_end(False)
+
+    def old():
+        D = B.toDFA(names=False).product(A.toDFA(names=False), lambda p, q: p and not q)
+        return D.F.empty()
+
+    def new():
+        return A.includes(B)
+
+    assert old() and new()
+    print(f"--- inclusion, {n}-th letter from the end " + "-" * 21)
+    print(f"{'operation':<24} {'subsets':>13} {'antichain':>13} {'speedup':>9}")
+    report("includes", timed(old, 1), timed(new))
+
+    def old_universal():
+        D = A.toDFA(names=False)
+        return all(q in D.F for q in D.Q)
+
+    assert not old_universal() and not A.is_universal()
+    report("is_universal", timed(old_universal, 1), timed(A.is_universal))
+
+
+def bench_operations(k=12, n=6):
+    import DFA
+
+    # the words containing a given word, a policy over k of them
+    def contains(word):
+        δ = DFA.δ()
+        A = DFA(Set(range(n + 1)), Set("a", "b"), δ, 0, Set(n))
+        for q in range(n + 1):
+            for a in "ab":
+                s = word[:q] + a
+                i = n if q == n else min(len(s), n)
+                while i and q < n and s[len(s) - i:] != word[:i]:
+                    i -= 1
+                δ[q, a] = i
+        return A
+
+    rnd = Random(1)
+    automata = [contains("".join(rnd.choice("ab") for _ in range(n))) for _ in range(k)]
+
+    def chain(minimize):
+        M = automata[0]
+        for i, A in enumerate(automata[1:]):
+            M = (M.union, M.difference, M.symmetric_difference)[i % 3](A, minimize)
+        return ~M
+
+    plain, minimal = chain(False), chain(True)
+    assert plain.equivalent(minimal)
+    print(f"--- {k} chained operations, {n + 1} states each " + "-" * 19)
+    print(f"{'operation':<24} {'plain':>13} {'minimized':>13} {'ratio':>9}")
+    print(f"{'states':<24} {len(plain.Q):>13} {len(minimal.Q):>13}"
+          f" {len(plain.Q) / len(minimal.Q):>8.1f}x")
+    report("chain", timed(lambda: chain(False), 1), timed(lambda: chain(True), 1))
+
+
+def bench_sfa():
+    import DFA
+    import SFA
+
+    print("--- SFA, identifiers over k letters " + "-" * 27)
+    print(f"{'letters':<24} {'explicit':>13} {'intervals':>13} {'speedup':>9}")
+    for k in (256, 4096, 16384):
+        letters = [chr(0x100 + i) for i in range(k)]
+
+        def explicit():
+            δ = DFA.δ()
+            A = DFA(Set("S", "I"), Set(letters + ["_"]), δ, "S", Set("I"))
+            for a in letters:
+                δ["S", a] = "I"
+                δ["I", a] = "I"
+            δ["I", "_"] = "I"
+            return A.minimize()
+
+        def symbolic():
+            return SFA.fromRegex(f"[{letters[0]}-{letters[-1]}]."
+                                 f"[{letters[0]}-{letters[-1]}_]*").minimize()
+
+        word = "".join(letters[i * 7 % k] for i in range(50))
+        assert explicit().test(word) and symbolic().test(word)
+        report(f"build k = {k}", timed(explicit, 1), timed(symbolic))
+
+
+bench_set()
+bench_tokenizer()
+bench_to_python()
+bench_bytes()
+bench_classes()
+bench_packed()
+bench_partial()
+bench_equivalent()
+bench_inclusion()
+bench_operations()
+bench_sfa()
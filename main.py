@@ -1,3 +1,7 @@
+from itertools import product
+import os
+import tempfile
+
 from utils import Set, Rule
 import FA
 import DFA
@@ -7,6 +11,8 @@ import RE
 import CFG
 import G
 import PDA
+import SFA
+from Tokenizer import Tokenizer
 
 
 def test_dfa():
@@ -26,6 +32,103 @@ def test_dfa():
     B.diagram()
     # B.table()
 
+    assert "⊗" not in A.Q and "7" in A.Q and B.Σ.values is A.Σ.values
+    assert len(A.minimize(complete=True).Q) == len(B.Q) + 1
+
+    # Hopcroft and the group table reduction give the same automata
+    for complete in (False, True):
+        M, R = A.minimize(complete=complete), A.minimize(reference=True, complete=complete)
+        assert (M.Q, M.F, M.q0, M.δ.items()) == (R.Q, R.F, R.q0, R.δ.items())
+    assert B.equivalent(A) and A.minimize(complete=True).equivalent(B)
+    assert (A ^ B).F.empty() and (~B).equivalent(A.complement(minimize=True))
+    assert all((~B).test(w) != B.test(w) for w in ("", "a", "aa", "ab", "aab"))
+    assert (A - B).F.empty() and (A - ~B).equivalent(A)
+    assert A.equivalent(A & A.product(A, lambda p, q: False), witness=True) == (False, ("a", "a"))
+
+    # every state of the product is the pair of states it stands for
+    P = A.product(B, lambda p, q: p or q)
+    assert P.pairs[P.q0] == (A.q0, B.q0) and P.equivalent(A | B)
+    for (s, a), t in P.δ.items():
+        p, q = P.pairs[s]
+        assert P.pairs[t] == tuple(None if r is None or M.δ[r, a] == "-" else M.δ[r, a]
+                                   for M, r in ((A, p), (B, q)))
+
+    # the shared alphabet is copied by whichever automata changes it
+    C = A.minimize()
+    C.Σ.add("z")
+    assert "z" in C.Σ and "z" not in A.Σ and "z" not in B.Σ and not (~A).test("z")
+
+    match = B.to_python()
+    for word in ("", "a", "aa", "aab", "aaba", "abab", "aaaa"):
+        assert match(word) == B.test(word), word
+
+    packed = B.compile_packed()
+    assert all(packed.test(word) == B.test(word) for word in ("aa", "aab", "abab"))
+
+    raw = B.compile_bytes("ascii")
+    for word in (b"aa", bytearray(b"aab"), memoryview(b"abab")):
+        assert raw.test(word) == B.test(bytes(word).decode())
+
+    # a byte is the latin-1 character everywhere bytes are read
+    for data in (b"aa", b"aab", b"abab", b"a\xe1"):
+        expected = B.test(data.decode("latin-1"))
+        assert B.compile_bytes().test(data) == B.stream().feed(data).accepting == expected
+        assert B.compile().test_parallel(data, workers=2, chunk_size=1) == expected
+
+    # a stream fed symbol by symbol or from a file ends where test does
+    words = ["".join(w) for k in range(6) for w in product("ab", repeat=k)]
+    words += ["ax", "aab" * 50, "aa" + "b" * 100, "aa" + "b" * 100 + "x"]
+    for word in words:
+        stream = B.stream()
+        for a in word:
+            stream.feed(a)
+        data = word.encode("latin-1")
+        assert stream.accepting == B.test(word) and stream.consumed == len(word)
+        assert B.stream().feed(data[:1]).feed(memoryview(data)[1:]).accepting == B.test(word)
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "data")
+        for word in ("", "aaba", "aab" * 50, "aa" + "b" * 100, "aa" + "b" * 100 + "x"):
+            with open(path, "w", encoding="latin-1") as file:
+                file.write(word)
+            assert B.stream().feed_file(path, chunk_size=7).accepting == B.test(word)
+            assert B.compile().test_file_parallel(path, workers=2, chunk_size=7) == B.test(word)
+
+    assert B.test_many(words).tolist() == [B.test(word) for word in words]
+    assert len(B.test_many([])) == 0
+
+    # the mapping of x + y is the one of x followed by the one of y
+    compiled = B.compile()
+    for x, y in (("", "aab"), ("aa", "b"), ("ab", "ba"), ("a", "bx"), ("aa", "b" * 40)):
+        first, second = compiled.mapping(x), compiled.mapping(y)
+        assert list(compiled.mapping(x + y)) == [second[q] if q >= 0 else -1 for q in first]
+        assert compiled.run(x + y) == compiled.mapping(x + y)[compiled.start]
+    for word in words[-4:]:
+        assert compiled.test_parallel(word, workers=2, chunk_size=17) == B.test(word)
+
+    def spans(M, text, longest):
+        # the leftmost match, then its longest or first end, by testing every substring
+        i = 0
+        while i <= len(text):
+            ends = [j for j in range(i, len(text) + 1) if M.test(text[i:j])]
+            if not ends:
+                i += 1
+                continue
+            end = max(ends) if longest else min(ends)
+            yield i, end
+            i = end if end > i else i + 1
+
+    # ~B matches the empty word, x is outside of Σ
+    for M in (B, ~B):
+        for text in ("", "aab", "abaab", "baabbxaab", "xx", "aabbbaaab" * 3):
+            for longest in (True, False):
+                assert M.find_all(text, longest) == list(spans(M, text, longest))
+    assert (~B).find_all("x") == [(0, 0), (1, 1)] and B.find_all("aab", False) == [(0, 2)]
+
+    assert A.test("aa") and not A.test("a")
+    A.F.add("2")
+    assert A.test("a")
+
 
 def test_nfa():
     δ = NFA.δ()
@@ -42,6 +145,38 @@ def test_nfa():
     B.diagram()
     # B.table()
 
+    C = A.toDFA(names=False)
+    assert C.equivalent(B) and all(q.isdigit() for q in C.Q)
+
+    # {1, 2} and {12} would both be named [12]
+    δ2 = NFA.δ()
+    D = NFA(Set(0, 1, 2, 12), Set("a", "b"), δ2, 0, Set(12))
+    δ2[0, "a"] = Set(1, 2); δ2[0, "b"] = Set(12)
+    assert Set("[0]", "[1,2]", "[12]", "[]") == D.toDFA().Q
+
+    # simulated on the sets of states as they come, no DFA is built
+    words = ["".join(w) for k in range(4) for w in product("abcd", repeat=k)]
+    assert all(A.test(word) == B.test(word) for word in words)
+    assert A.test_many(words) == [B.test(word) for word in words]
+
+    # a cache of two states is flushed on the way and still agrees
+    lazy = A.lazy(max_states=2)
+    assert [lazy.test(word) for word in words] == [B.test(word) for word in words]
+    assert lazy.flushes and len(lazy) <= 2 and not lazy.test("bx")
+    lazy = A.lazy()
+    lazy.test("bbcb")
+    misses = lazy.misses
+    assert lazy.test("bbcb") == B.test("bbcb") and lazy.misses == misses and lazy.hits == 4
+
+    assert A.test("b") and not A.test("a")
+    δ["2", "a"].add("4")
+    assert A.test("a")
+
+    size = len(δ)
+    assert not δ[1, "x"] and len(δ) == size
+    δ.setdefault((1, "x")).add("2")
+    assert δ[1, "x"] == Set("2")
+
 
 def test_efa():
     δ = EFA.δ()
@@ -59,6 +194,13 @@ def test_efa():
     # B.table()
     # C.table()
 
+    words = ["".join(w) for k in range(4) for w in product("abcd", repeat=k)]
+    assert all(A.test(word) == B.test(word) == C.test(word) for word in words)
+
+    assert A.δ.Dε(3) == Set("3", "4") and not A.test("d")
+    δ["3", "ε"].add("2")
+    assert A.δ.Dε(3) == Set("3", "4", "2") and A.test("d")
+
 
 def test_re():
     δ = RE.δ()
@@ -67,6 +209,76 @@ def test_re():
     B = A.toEFA()
     B.diagram()
 
+    δ = RE.δ()
+    A = RE(Set(0, 1), Set("a", "b", "c", "d"), δ, Set(0), Set(1))
+    δ[0, "(a.b)+(c.d)"] = Set(1)
+    B = A.toEFA()
+    assert B.test("ab") and B.test("cd")
+    assert not B.test("ad") and not B.test("cb")
+    D = B.toDFA()
+    assert all(D.test(w) == B.test(w) for w in ("ab", "cd", "ad", "abcd", ""))
+
+    δ = RE.δ()
+    A = RE(Set(0, 1), Set("a", "b", "c", "d"), δ, Set(0), Set(1))
+    δ[0, "(a+b+c+d)*"] = Set(1)
+    C = A.toEFA()
+    assert C.includes(B) and not B.includes(C) and C.is_universal()
+    assert B.includes(C, witness=True) == (False, ())
+    assert B.is_universal(witness=True) == (False, ())
+
+    δ = RE.δ()
+    A = RE(Set(0, 1), Set("a"), δ, Set(0), Set(1))
+    δ[0, "a"] = Set(1)
+    assert A.toEFA().test("a")
+
+    # [ and ] are plain characters outside of SFA
+    δ = RE.δ()
+    A = RE(Set(0, 1), Set("[", "a", "]"), δ, Set(0), Set(1))
+    δ[0, "[.a.]"] = Set(1)
+    assert A.toEFA().test("[a]") and not A.toEFA().test("a")
+
+
+def test_tokenizer():
+    lexer = Tokenizer([
+        ("IF", "i.f"),
+        ("ID", "(i+f+x).(i+f+x)*"),
+        ("WS", " . *"),
+        ("EQ", "="),
+        ("EQEQ", "=.=")
+    ])
+
+    tokens = list(lexer.tokenize("if iff x==if"))
+    assert tokens == [("IF", "if", 0), ("WS", " ", 2), ("ID", "iff", 3),
+                      ("WS", " ", 6), ("ID", "x", 7), ("EQEQ", "==", 8),
+                      ("IF", "if", 10)], tokens
+
+    text = "if iff x==if" * 3
+    assert list(lexer.stream(text)) == list(lexer.tokenize(text))
+
+    chunks = ["i", "ff", "  =", "=", "", "x"]
+    assert list(lexer.stream(chunks)) == [
+        ("ID", "iff", 0), ("WS", "  ", 3), ("EQEQ", "==", 5), ("ID", "x", 7)]
+
+    try:
+        list(lexer.tokenize("if ?"))
+        assert False, "no token matches ?"
+    except ValueError as error:
+        assert str(error) == "no token matches at offset 3"
+
+    brackets = Tokenizer([("L", "["), ("R", "]"), ("X", "x")])
+    assert [name for name, _, _ in brackets.tokenize("[x]")] == ["L", "X", "R"]
+
+
+def test_sfa():
+    A = SFA.fromRegex("[a-z_].[a-z0-9_]*+[0-9].[0-9]*")
+    B = A.minimize()
+    # B.table()
+    for word in ("x", "x1_", "_", "42", "4x", "", "X"):
+        assert A.test(word) == B.test(word) == (word in ("x", "x1_", "_", "42"))
+
+    C = A & SFA.fromRegex("[^0-9].[^0-9]*")
+    assert C.test("abc") and not C.test("a1") and not C.test("12")
+
 
 def test_grammar():
     P = G.P({
@@ -207,6 +419,8 @@ test_dfa()
 test_nfa()
 test_efa()
 test_re()
+test_tokenizer()
+test_sfa()
 test_grammar()
 test_cfg()
 test_pda()
@@ -1,11 +1,25 @@
 from collections.abc import Iterable
 from itertools import chain, combinations
+import weakref
 
 
 def all_subsets(ss):
     return chain(*map(lambda x: combinations(ss, x), range(0, len(ss) + 1)))
 
 
+def bits(mask):
+    """
+
+    yield the positions of the bits set in the int mask
+
+    """
+
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
 def roman(num):
     """
 
@@ -31,59 +45,110 @@ class Set:
 
     Ordered set
 
+    the values are kept as keys of an insertion ordered dict,
+    so membership, add and remove are O(1)
+
+    the owners (automata or δ holding the set, weakly referenced)
+    are told through their invalidate() whenever the set changes
+    in place
+
+    share() gives another set over the same values, copy on write,
+    whichever of them changes first copies the values for itself
+
     """
 
+    owners = ()
+    shared = False
+
     def __init__(self, *args):
 
         if len(args) == 1 and isinstance(args[0], Iterable) and type(args[0]) not in (Set, str, tuple, Rule):
-            seen = set()
-            self.values = [arg for arg in args[0]
-                           if not (arg in seen or seen.add(arg))]
+            self.values = dict.fromkeys(args[0])
 
         else:
-            seen = set()
-            self.values = [arg for arg in args
-                           if not (arg in seen or seen.add(arg))]
+            self.values = dict.fromkeys(args)
 
     def map(self, func):
-        self.values = list(map(func, self.values))
+        self.values = dict.fromkeys(map(func, self.values))
+        self.shared = False
+        self.changed()
+        return self
+
+    def share(self):
+        result = Set()
+        result.values = self.values
+        self.shared = result.shared = True
+        return result
+
+    def write(self):
+        """
+        make the values its own before changing them in place
+        """
+        if self.shared:
+            self.values = self.values.copy()
+            self.shared = False
+
+    def own(self, owner):
+        owners = [ref for ref in self.owners if ref() is not None]
+        if not any(ref() is owner for ref in owners):
+            owners.append(weakref.ref(owner))
+        self.owners = tuple(owners)
         return self
 
+    def changed(self):
+        for ref in self.owners:
+            owner = ref()
+            if owner is not None:
+                owner.invalidate()
+
+    def __getstate__(self):
+        return {"values": self.values}
+
     @classmethod
     def Union(set, sets):
         result = Set()
         for s in sets:
-            result = result.union(s)
+            result.values.update(dict.fromkeys(s))
         return result
 
     def union(self, other):
-        seen = set()
-        return Set([x for x in self.values + other.values if not (x in seen or seen.add(x))])
+        result = self.copy()
+        result.values.update(dict.fromkeys(other))
+        return result
 
     def __or__(self, other):
         return self.union(other)
 
     def add(self, other):
-        self.values = self.union(Set(other)).values
+        self.write()
+        self.values.update(Set(other).values)
+        self.changed()
 
     def __add__(self, other):
         return self.union(other)
 
     def intercept(self, other):
-        return Set([x for x in self.values + other.values if x in other.values and x in self.values])
+        return Set([x for x in self.values if x in other])
 
     def remove(self, item):
-        self.values.remove(item)
+        if item not in self.values:
+            raise ValueError(f"{item} not in {self}")
+        self.write()
+        del self.values[item]
+        self.changed()
 
     def cross(self, other):
         return Set((p, q) for p in self for q in other)
 
     def difference(self, other):
-        return Set([x for x in self.values if x not in other.values])
+        return Set([x for x in self.values if x not in other])
 
     def __sub__(self, other):
         return self.difference(other)
 
+    def __contains__(self, item):
+        return item in self.values
+
     def __len__(self):
         return len(self.values)
 
@@ -91,22 +156,38 @@ class Set:
         return len(self.values) == 0
 
     def __iter__(self):
-        return iter(self.values)
+        # iterate a snapshot, the set may grow while being walked
+        return iter(tuple(self.values))
 
     def __eq__(self, other):
+        if isinstance(other, Set):
+            return self.values.keys() == other.values.keys()
         return set(self) == set(other)
 
     def __hash__(self):
         return sum(map(hash, self.values))
 
     def pop(self, index=-1):
-        return self.values.pop(index)
+        self.write()
+        if index == -1:
+            item = self.values.popitem()[0]
+        else:
+            item = self[index]
+            del self.values[item]
+        self.changed()
+        return item
 
     def copy(self):
-        return Set(self.values)
+        result = Set()
+        result.values = self.values.copy()
+        return result
 
     def __getitem__(self, key):
-        return self.values[key]
+        if key == 0 and self.values:
+            return next(iter(self.values))
+        if key == -1 and self.values:
+            return next(reversed(self.values))
+        return list(self.values)[key]
 
     def __repr__(self):
         return f"{{{', '.join(map(str, self.values))}}}" if len(self.values) != 0 else 'Ø'
@@ -125,14 +206,19 @@ class Token:
         self.value = value
 
     def __repr__(self):
-        if self.name == "CHAR":
+        if self.name in ("CHAR", "CLASS"):
             return self.value
         return self.name
 
 
 class Lexer:
-    def __init__(self, pattern):
+    def __init__(self, pattern, classes=False):
+        """
+        with classes a [...] is read as one CLASS token (as SFA does),
+        otherwise [ is a plain character like everywhere in RE
+        """
         self.source = pattern
+        self.classes = classes
         self.symbols = {'(': 'LEFT_PAREN',
                         ')': 'RIGHT_PAREN',
                         '*': 'STAR',
@@ -145,7 +231,13 @@ class Lexer:
         if self.current < self.length:
             c = self.source[self.current]
             self.current += 1
-            if c not in self.symbols.keys():  # CHAR
+            if c == '[' and self.classes:  # CLASS [a-z0-9] or [^a-z]
+                end = self.source.find(']', self.current + 1)
+                if end < 0:
+                    raise ParseError(f"Unclosed class at {self.current - 1}")
+                token = Token('CLASS', self.source[self.current - 1:end + 1])
+                self.current = end + 1
+            elif c not in self.symbols.keys():  # CHAR
                 token = Token('CHAR', c)
             else:
                 token = Token(self.symbols[c], c)
@@ -170,6 +262,7 @@ factor   = primary [*]       star {push '*'}
          | primary
 primary  = \( exp \)
          | char              literal {push char}
+         | [class]           character class {push class}, only with classes
 '''
 
 
@@ -215,13 +308,13 @@ class Parser:
             self.consume('LEFT_PAREN')
             self.exp()
             self.consume('RIGHT_PAREN')
-        elif self.lookahead.name == 'CHAR':
+        elif self.lookahead.name in ('CHAR', 'CLASS'):
             self.tokens.append(self.lookahead)
-            self.consume('CHAR')
+            self.consume(self.lookahead.name)
 
 
-def parseRegex(regexp):
-    lexer = Lexer(regexp)
+def parseRegex(regexp, classes=False):
+    lexer = Lexer(regexp, classes)
     return Parser(lexer).parse()
 
 